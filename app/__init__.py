@@ -81,6 +81,10 @@ def create_app(config_name=None):
         except:
             return []
     
+    # [模板全局变量]
+    from app.models.task_execution import ExecutionStatus
+    app.jinja_env.globals['ExecutionStatus'] = ExecutionStatus
+    
     # [主页路由]
     @app.route('/')
     def index():
@@ -99,10 +103,22 @@ def create_app(config_name=None):
     from app.scheduler import task_scheduler
     task_scheduler.init_app(app)
     
+    # [初始化系统状态采样]
+    from app.system_monitor import system_monitor
+    system_monitor.init_app(app)
+    
+    # [初始化执行记录保留策略]
+    from app.execution_retention import execution_retention
+    execution_retention.init_app(app)
+    
+    # [初始化Excel批量导入]
+    from app.url_import import url_import_manager
+    url_import_manager.init_app(app)
+    
     # [创建数据库表]
     with app.app_context():
         # 导入所有模型以确保它们被注册
-        from app.models import User, File, Task, TaskExecution
+        from app.models import User, File, Task, TaskExecution, TaskExecutionDaily
         from app.models.url_context import UrlUpdateContext, UrlMenu, BatchUrlFind
         
         db.create_all()
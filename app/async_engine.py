@@ -0,0 +1,188 @@
+"""
+[4-7] asyncio上传引擎
+配置 UPLOAD_ENGINE=asyncio 时使用，代替线程池引擎：
+所有网站的 登录 → 上传 → 间隔等待 → 刷新 流程作为协程运行在同一个事件循环中，
+间隔等待使用 asyncio.sleep，不再占用线程
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncUploadEngine:
+    """
+    [4-7.1] asyncio上传引擎
+    - 帝国CMS的请求仍使用 test.py 中的 requests 会话（登录会话池），
+      在大小为 ASYNC_UPLOAD_MAX_CONNECTIONS 的HTTP线程池中执行，线程池大小即全局并发连接上限
+    - 数据库读写在大小为 ASYNC_UPLOAD_DB_WORKERS 的数据库线程池中执行
+    - 同一网站的上传流程通过 asyncio.Lock 串行执行，与线程池引擎按网站排队的语义一致
+    """
+
+    def __init__(self, task_scheduler):
+        """
+        [4-7.1.1] 初始化引擎，事件循环在首次使用时才启动
+        """
+        self.task_scheduler = task_scheduler
+        self.loop = None
+        self.loop_thread = None
+        self.http_executor = None
+        self.db_executor = None
+        self.site_locks = {}
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """
+        [4-7.1.2] 在后台线程中启动事件循环
+        """
+        with self.start_lock:
+            if self.loop is not None:
+                return
+
+            config = self.task_scheduler.app.config
+            self.http_executor = ThreadPoolExecutor(
+                max_workers=config.get('ASYNC_UPLOAD_MAX_CONNECTIONS', 50),
+                thread_name_prefix='async-upload-http'
+            )
+            self.db_executor = ThreadPoolExecutor(
+                max_workers=config.get('ASYNC_UPLOAD_DB_WORKERS', 4),
+                thread_name_prefix='async-upload-db'
+            )
+
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(
+                target=self.loop.run_forever,
+                name='async-upload-loop',
+                daemon=True
+            )
+            self.loop_thread.start()
+            logger.info("asyncio上传引擎已启动")
+
+    def shutdown(self):
+        """
+        [4-7.1.3] 停止事件循环和线程池
+        """
+        with self.start_lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=5)
+            self.http_executor.shutdown(wait=False)
+            self.db_executor.shutdown(wait=False)
+            self.loop = None
+            logger.info("asyncio上传引擎已停止")
+
+    def run_task(self, task_info, distributor, start_delays):
+        """
+        [4-7.1.4] 提交一次任务执行
+        distributor 为本次执行的 FileDistributor，start_delays 为每个目标的启动延迟（StartRamp计算），
+        返回 concurrent.futures.Future
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.run_uploads(task_info, distributor, start_delays), self.loop)
+
+    async def run_uploads(self, task_info, distributor, start_delays):
+        """
+        [4-7.1.5] 并发运行所有网站的上传流程
+        """
+        coroutines = []
+        for index, start_delay in enumerate(start_delays):
+            coroutines.append(self.upload_to_target(task_info, distributor, index, start_delay))
+
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"上传任务失败: {str(result)}")
+
+    async def upload_to_target(self, task_info, distributor, index, start_delay=0):
+        """
+        [4-7.1.6] 上传文件到指定目标URL（asyncio引擎）
+        步骤与线程池引擎的 SitePipeline 相同
+        """
+        scheduler = self.task_scheduler
+        target_url = distributor.target_urls[index]
+        if start_delay:
+            await asyncio.sleep(start_delay)
+
+        try:
+            target = await self.run_db(scheduler.prepare_upload_target, target_url)
+
+            async with self.get_site_lock(target['root_url']):
+                distributor.start(index)
+                await self.run_http(scheduler.login_site, target)
+
+                uploaded_count = 0
+                success_count = 0
+                while True:
+                    file_id = distributor.next_file(index)
+                    if file_id is None:
+                        break
+
+                    # 单个文件出错不结束流程：读取失败记为失败并跳过，数据库或网络错误把文件放回文件池
+                    try:
+                        file_data = await self.run_db(scheduler.load_upload_file, file_id)
+                    except Exception as e:
+                        logger.error(f"加载文件 {file_id} 时发生错误: {str(e)}")
+                        await self.run_db(scheduler.release_file_ids, [file_id])
+                        continue
+                    if file_data is None:
+                        continue
+                    if file_data['read_error']:
+                        await self.run_db(scheduler.record_read_failure, task_info, target, file_data)
+                        continue
+
+                    try:
+                        status_code, msg = await self.run_http(scheduler.upload_file_to_site, target, file_data)
+                    except Exception as e:
+                        logger.error(f"上传文件 {file_data['original_filename']} 到 {target['root_url']} "
+                                     f"时发生错误: {str(e)}")
+                        await self.run_db(scheduler.release_file_ids, [file_id])
+                        distributor.report(index, False)
+                        await asyncio.sleep(task_info['interval_seconds'])
+                        continue
+
+                    uploaded_count += 1
+                    scheduler.emit_upload_progress(task_info, target, file_data['original_filename'],
+                                                   uploaded_count, uploaded_count + distributor.remaining(index))
+                    await self.run_db(scheduler.record_upload_result, task_info, target, file_data, status_code, msg)
+                    if status_code == 200:
+                        success_count += 1
+                    distributor.report(index, status_code == 200)
+                    await asyncio.sleep(task_info['interval_seconds'])
+
+                if success_count:
+                    await self.run_http(scheduler.refresh_site, target)
+
+        except Exception as e:
+            logger.error(f"上传文件到 {target_url} 时发生错误: {str(e)}")
+            return False, None, str(e)
+
+        finally:
+            # 最后一个结束的流程把未上传的文件释放回文件池
+            leftover = distributor.finish(index)
+            if leftover:
+                await self.run_db(scheduler.release_file_ids, leftover)
+                logger.info(f"任务 (ID: {task_info['id']}) 释放了 {len(leftover)} 个未上传的文件")
+
+    def get_site_lock(self, root_url):
+        """
+        [4-7.1.7] 获取网站的协程锁
+        只在事件循环线程中访问，不需要额外加锁
+        """
+        if root_url not in self.site_locks:
+            self.site_locks[root_url] = asyncio.Lock()
+        return self.site_locks[root_url]
+
+    async def run_http(self, func, *args):
+        """
+        [4-7.1.8] 在HTTP线程池中执行网站请求
+        """
+        return await self.loop.run_in_executor(self.http_executor, func, *args)
+
+    async def run_db(self, func, *args):
+        """
+        [4-7.1.9] 在数据库线程池中执行数据库操作（独立的应用上下文）
+        """
+        return await self.loop.run_in_executor(self.db_executor, self.task_scheduler.in_app_context, func, *args)
@@ -0,0 +1,117 @@
+"""
+[4-6] 任务文件领取队列
+为每个任务在内存中预留下一批文件ID，并在上一批文件上传期间后台预取，
+任务执行时直接从内存取文件，不用再等待数据库领取
+"""
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TaskClaimQueue:
+    """
+    [4-6.1] 单个任务的文件领取队列
+    队列中的文件在数据库里已经标记为 is_executing=1（已预留），
+    顺序与领取顺序一致：主文件夹在前，备用文件夹在后
+    """
+
+    def __init__(self, task_scheduler, task_id):
+        """
+        [4-6.1.1] 初始化领取队列
+        """
+        self.task_scheduler = task_scheduler
+        self.task_id = task_id
+        self.reserved = deque()
+        self.lock = threading.Lock()
+        self.prefetch_thread = None
+        self.closed = False
+
+    def take(self, count):
+        """
+        [4-6.1.2] 取出count个已预留的文件ID
+        后台预取未完成时先等待它，缓冲仍不足时同步补领
+        """
+        prefetch_thread = self.prefetch_thread
+        if prefetch_thread is not None:
+            prefetch_thread.join()
+
+        with self.lock:
+            take_count = min(count, len(self.reserved))
+            file_ids = [self.reserved.popleft() for _ in range(take_count)]
+
+        if len(file_ids) < count:
+            file_ids.extend(self._claim(count - len(file_ids)))
+        return file_ids
+
+    def prefetch(self, count):
+        """
+        [4-6.1.3] 后台预取下一批文件
+        已有预取线程在运行或缓冲已足够时不重复预取
+        """
+        with self.lock:
+            if self.closed:
+                return
+            if self.prefetch_thread is not None and self.prefetch_thread.is_alive():
+                return
+            missing = count - len(self.reserved)
+            if missing <= 0:
+                return
+
+            self.prefetch_thread = threading.Thread(
+                target=self._prefetch_worker,
+                args=(missing,),
+                name=f'claim-prefetch-{self.task_id}',
+                daemon=True
+            )
+            self.prefetch_thread.start()
+
+    def release(self):
+        """
+        [4-6.1.4] 关闭队列并释放所有未使用的预留文件
+        任务暂停或从调度器移除时调用；正在进行的预取完成后会自行释放
+        """
+        with self.lock:
+            self.closed = True
+            file_ids = list(self.reserved)
+            self.reserved.clear()
+
+        self._release(file_ids)
+
+    def _prefetch_worker(self, count):
+        """
+        [4-6.1.5] 预取线程
+        领取完成时如果队列已关闭，立即释放刚领取的文件
+        """
+        file_ids = self._claim(count)
+        with self.lock:
+            if not self.closed:
+                self.reserved.extend(file_ids)
+                logger.info(f"任务 (ID: {self.task_id}) 已预取 {len(file_ids)} 个文件")
+                return
+
+        self._release(file_ids)
+
+    def _claim(self, count):
+        """
+        [4-6.1.6] 从数据库领取文件ID
+        """
+        from app.models.task import Task
+
+        with self.task_scheduler.app.app_context():
+            task = Task.query.get(self.task_id)
+            if not task:
+                return []
+            return self.task_scheduler.claim_file_ids(task, count)
+
+    def _release(self, file_ids):
+        """
+        [4-6.1.7] 把预留文件的 is_executing 改回0
+        """
+        if not file_ids:
+            return
+
+        with self.task_scheduler.app.app_context():
+            self.task_scheduler.release_file_ids(file_ids)
+        logger.info(f"任务 (ID: {self.task_id}) 已释放 {len(file_ids)} 个预留文件")
@@ -0,0 +1,199 @@
+"""
+[8] 执行记录导出
+按任务、用户、网站、日期范围筛选执行记录，以CSV（流式）或XLSX格式下载；
+数据库端使用服务端游标分批读取，导出几百万行时内存占用也保持不变
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from app.models.task import Task
+from app.models.task_execution import TaskExecution
+
+logger = logging.getLogger(__name__)
+
+# 导出列：(表头, 查询列)
+EXPORT_COLUMNS = (
+    ('执行ID', TaskExecution.id),
+    ('任务ID', TaskExecution.task_id),
+    ('任务名称', Task.task_name),
+    ('用户ID', Task.user_id),
+    ('文件ID', TaskExecution.file_id),
+    ('执行时间', TaskExecution.execution_time),
+    ('状态', TaskExecution.status),
+    ('目标网站', TaskExecution.execute_url),
+    ('栏目值', TaskExecution.url_menu_value),
+    ('栏目名称', TaskExecution.url_menu_text),
+    ('信息', TaskExecution.error_message),
+)
+
+# XLSX 单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+# 每次从数据库游标读取的行数
+FETCH_SIZE = 1000
+
+# 读取临时XLSX文件时每块的字节数
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def parse_date(value):
+    """
+    [8-1] 解析 YYYY-MM-DD 格式的日期，为空时返回None，格式错误时抛出ValueError
+    """
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def escape_like(value):
+    """
+    [8-1.1] 转义 LIKE 通配符，使 % 和 _ 按普通字符匹配（转义符为反斜杠）
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def build_export_query(task_id=None, user_id=None, site=None, start_date=None, end_date=None):
+    """
+    [8-2] 构建导出查询
+    start_date、end_date 为日期（含当天），按 (execution_time, id) 排序以使用执行时间索引
+    """
+    stmt = select(*[column for _, column in EXPORT_COLUMNS])\
+        .join(Task, TaskExecution.task_id == Task.id)
+
+    if task_id is not None:
+        stmt = stmt.where(TaskExecution.task_id == task_id)
+    if user_id is not None:
+        stmt = stmt.where(Task.user_id == user_id)
+    if site:
+        stmt = stmt.where(TaskExecution.execute_url.like(f'%{escape_like(site)}%', escape='\\'))
+    if start_date is not None:
+        stmt = stmt.where(TaskExecution.execution_time >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(TaskExecution.execution_time < end_date + timedelta(days=1))
+
+    return stmt.order_by(TaskExecution.execution_time.asc(), TaskExecution.id.asc())
+
+
+def iter_rows(stmt):
+    """
+    [8-3] 用服务端游标逐批读取导出行
+    yield_per 会让 PyMySQL 使用无缓冲游标，结果不会一次性加载到内存
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=FETCH_SIZE))
+    try:
+        for partition in result.partitions():
+            for row in partition:
+                yield [format_value(value) for value in row]
+    finally:
+        result.close()
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def export_filename(extension):
+    return f'task_executions_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+def csv_response(stmt):
+    """
+    [8-4] CSV 流式响应
+    每读取 FETCH_SIZE 行输出一块，开头写入BOM以便Excel正确识别UTF-8中文
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        buffer.write('\ufeff')
+        writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+        row_count = 0
+        for row in iter_rows(stmt):
+            writer.writerow(row)
+            row_count += 1
+            if row_count % FETCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+        logger.info(f"CSV导出完成，共 {row_count} 行")
+
+    return Response(stream_with_context(generate()),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={export_filename("csv")}'})
+
+
+def xlsx_response(stmt):
+    """
+    [8-5] XLSX 下载响应
+    openpyxl 只写模式必须 save 之后才能得到完整文件，所以先把整个工作簿写入临时文件
+    （行数据不保留在内存中，内存占用不变），再分块发送并删除临时文件；
+    与CSV不同，大数据量时要等文件生成完才开始下载。超过单表行数上限时自动新建工作表
+    """
+    from openpyxl import Workbook
+
+    headers = [header for header, _ in EXPORT_COLUMNS]
+    workbook = Workbook(write_only=True)
+    sheet_index = 1
+    sheet = workbook.create_sheet(title='执行记录')
+    sheet.append(headers)
+    sheet_rows = 1
+    row_count = 0
+
+    for row in iter_rows(stmt):
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheet_index += 1
+            sheet = workbook.create_sheet(title=f'执行记录{sheet_index}')
+            sheet.append(headers)
+            sheet_rows = 1
+        sheet.append(row)
+        sheet_rows += 1
+        row_count += 1
+
+    fd, temp_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(temp_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    logger.info(f"XLSX导出完成，共 {row_count} 行")
+
+    def generate():
+        try:
+            with open(temp_path, 'rb') as f:
+                while True:
+                    chunk = f.read(FILE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            os.remove(temp_path)
+
+    return Response(generate(),
+                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                    headers={'Content-Disposition': f'attachment; filename={export_filename("xlsx")}',
+                             'Content-Length': str(os.path.getsize(temp_path))})
+
+
+def export_response(stmt, export_format):
+    """
+    [8-6] 按格式返回导出响应，export_format 为 csv 或 xlsx
+    """
+    if export_format == 'xlsx':
+        return xlsx_response(stmt)
+    return csv_response(stmt)
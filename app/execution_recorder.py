@@ -0,0 +1,241 @@
+"""
+[4-14] 执行记录批量写入
+上传结果先放进内存缓冲，由后台线程每攒够 N 条或每隔 T 毫秒合并写入一次：
+一条多行 INSERT 写入 task_executions，一条 UPDATE ... CASE 更新成功文件的状态和路径，
+并累加 task_execution_daily 汇总，整批在同一个事务里提交，代替每个文件两次提交。
+整批写入失败时逐条重写，仍失败的记录放回缓冲重试，超过重试次数后写入死信文件（JSON Lines），
+缓冲已满时由调用方同步写入，应用退出时不丢弃任何记录
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import case, insert, update
+
+from app import db
+from app.models.file import File
+from app.models.task_execution import TaskExecution, TaskExecutionDaily
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionRecorder:
+    """
+    [4-14.1] 执行记录写入器
+    缓冲中的每一项为 (execution, file_update, 已失败次数)；
+    关闭后（应用退出时）不再缓冲，record 直接同步写入
+    """
+
+    def __init__(self, task_scheduler):
+        """
+        [4-14.1.1] 初始化，后台线程在首次记录时才启动
+        """
+        self.task_scheduler = task_scheduler
+        self.buffer = []
+        self.condition = threading.Condition()
+        # 串行化写入，避免定时刷新和关闭时的刷新同时进行
+        self.flush_lock = threading.Lock()
+        self.flush_thread = None
+        self.closed = False
+        self.flushed_count = 0
+        self.flush_count = 0
+        self.dead_letter_count = 0
+
+    def _config(self, name, default):
+        return self.task_scheduler.app.config.get(name, default)
+
+    def start(self):
+        """
+        [4-14.1.2] 启动后台刷新线程
+        """
+        with self.condition:
+            if self.flush_thread is not None or self.closed:
+                return
+            self.flush_thread = threading.Thread(target=self._run, name='execution-recorder', daemon=True)
+            self.flush_thread.start()
+
+    def record(self, execution, file_update=None):
+        """
+        [4-14.1.3] 缓冲一条执行记录
+        execution 为 task_executions 的列值字典；
+        file_update 为成功文件的 {'id', 'file_path', 'executed_at'}，失败时为None；
+        缓冲达到 EXECUTION_BUFFER_MAX 条时不再缓冲，在调用方线程中同步写入
+        """
+        self.start()
+        with self.condition:
+            if not self.closed and len(self.buffer) < self._config('EXECUTION_BUFFER_MAX', 10000):
+                self.buffer.append((execution, file_update, 0))
+                if len(self.buffer) >= self._config('EXECUTION_FLUSH_SIZE', 100):
+                    self.condition.notify()
+                return
+
+        # 已关闭或缓冲已满：直接写入
+        self.flush_batch([(execution, file_update, 0)])
+
+    def _run(self):
+        """
+        [4-14.1.4] 后台线程：攒够一批或到达时间间隔时写入
+        """
+        interval = self._config('EXECUTION_FLUSH_INTERVAL_MS', 1000) / 1000.0
+        batch_size = self._config('EXECUTION_FLUSH_SIZE', 100)
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + interval
+                while not self.closed and len(self.buffer) < batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.closed:
+                    return
+                batch, self.buffer = self.buffer, []
+
+            if batch:
+                self.flush_batch(batch)
+
+    def flush(self):
+        """
+        [4-14.1.5] 立即写入缓冲中的全部记录
+        """
+        with self.condition:
+            batch, self.buffer = self.buffer, []
+        if batch:
+            self.flush_batch(batch)
+
+    def shutdown(self):
+        """
+        [4-14.1.6] 应用退出时调用：停止后台线程并写入剩余记录
+        关闭后写入失败的记录不再放回缓冲，直接写入死信文件
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        if self.flush_thread is not None:
+            self.flush_thread.join(timeout=10)
+        self.flush()
+        logger.info(f"执行记录写入器已停止，共写入 {self.flushed_count} 条记录")
+
+    def flush_batch(self, batch):
+        """
+        [4-14.1.7] 在一个事务中写入一批记录
+        整批写入失败时逐条写入，找出写不进去的记录交给 retry_or_dead_letter，其余记录正常保存
+        """
+        with self.flush_lock, self.task_scheduler.app.app_context():
+            try:
+                self.write_rows(batch)
+                self.flush_count += 1
+                return
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"批量写入执行记录失败（{len(batch)} 条），改为逐条写入: {str(e)}")
+
+            failed = []
+            for item in batch:
+                try:
+                    self.write_rows([item])
+                except Exception as e:
+                    db.session.rollback()
+                    failed.append((item, str(e)))
+
+        if failed:
+            self.retry_or_dead_letter(failed)
+
+    def write_rows(self, batch):
+        """
+        [4-14.1.8] 多行INSERT执行记录、累加每日汇总、更新成功文件，同一事务提交
+        """
+        executions = [execution for execution, _, _ in batch]
+        file_updates = [file_update for _, file_update, _ in batch if file_update]
+
+        # 多行INSERT
+        db.session.execute(insert(TaskExecution), executions)
+        # 同一事务内累加每日汇总
+        TaskExecutionDaily.increment(executions)
+
+        if file_updates:
+            file_ids = [item['id'] for item in file_updates]
+            db.session.execute(
+                update(File)
+                .where(File.id.in_(file_ids))
+                .values(
+                    is_executed=True,
+                    is_executing=False,
+                    file_path=case({item['id']: item['file_path'] for item in file_updates}, value=File.id),
+                    executed_at=case({item['id']: item['executed_at'] for item in file_updates}, value=File.id)
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        db.session.commit()
+        self.flushed_count += len(batch)
+
+    def retry_or_dead_letter(self, failed):
+        """
+        [4-14.1.9] 处理逐条写入仍失败的记录
+        失败次数未达到 EXECUTION_FLUSH_MAX_RETRIES 且写入器未关闭、缓冲未满时放回缓冲，下次刷新重试；
+        否则写入死信文件，避免无限重试或在退出时丢失
+        """
+        max_retries = self._config('EXECUTION_FLUSH_MAX_RETRIES', 5)
+        buffer_max = self._config('EXECUTION_BUFFER_MAX', 10000)
+        dead = []
+        with self.condition:
+            retry = []
+            for (execution, file_update, attempts), error in failed:
+                if attempts + 1 < max_retries and not self.closed and \
+                        len(self.buffer) + len(retry) < buffer_max:
+                    retry.append((execution, file_update, attempts + 1))
+                else:
+                    dead.append((execution, file_update, attempts + 1, error))
+            self.buffer[:0] = retry
+
+        if retry:
+            logger.warning(f"{len(retry)} 条执行记录写入失败，稍后重试")
+        if dead:
+            self.dead_letter(dead)
+
+    def dead_letter(self, records):
+        """
+        [4-14.1.10] 把无法写入数据库的记录追加到死信文件，每行一条JSON
+        file_update 不为空的记录对应的文件在数据库中仍是“正在执行”状态、路径为移动前的路径，
+        需要按死信文件中的 file_path 手工修复
+        """
+        path = self._config('EXECUTION_DEAD_LETTER_FILE', 'execution_dead_letter.jsonl')
+        for execution, file_update, attempts, error in records:
+            logger.error(f"执行记录写入失败 {attempts} 次，转入死信文件 {path}: "
+                         f"任务 {execution.get('task_id')} 文件 {execution.get('file_id')}，错误: {error}")
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                for execution, file_update, attempts, error in records:
+                    f.write(json.dumps({
+                        'execution': execution,
+                        'file_update': file_update,
+                        'attempts': attempts,
+                        'error': error,
+                        'failed_at': time.strftime('%Y-%m-%d %H:%M:%S')
+                    }, ensure_ascii=False, default=str) + '\n')
+        except Exception as e:
+            # 死信文件也写不进去时，完整记录内容至少保留在日志中
+            logger.error(f"写入死信文件失败: {str(e)}")
+            for execution, file_update, _, _ in records:
+                logger.error(f"未保存的执行记录: {json.dumps([execution, file_update], ensure_ascii=False, default=str)}")
+        self.dead_letter_count += len(records)
+
+    def stats(self):
+        """
+        [4-14.1.11] 状态信息
+        """
+        with self.condition:
+            buffered = len(self.buffer)
+        return {
+            'buffered': buffered,
+            'flushed_records': self.flushed_count,
+            'flushes': self.flush_count,
+            'dead_letters': self.dead_letter_count
+        }
@@ -0,0 +1,200 @@
+"""
+[9] 执行记录保留策略
+task_executions 只保留最近 N 天的明细，更早的明细由后台任务分块删除，统计继续读取 task_execution_daily 汇总表；
+删除前可选择把明细归档为 gzip 压缩的CSV文件。
+每块只删除少量按主键排序的记录并立即提交，块之间短暂停顿，不会长时间锁表阻塞调度器写入执行记录
+"""
+import csv
+import gzip
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from app import db
+from app.models.task_execution import TaskExecution
+
+logger = logging.getLogger(__name__)
+
+# 归档文件的列
+ARCHIVE_COLUMNS = ('id', 'task_id', 'file_id', 'execution_time', 'status', 'error_message',
+                   'response_data', 'execute_url', 'url_menu_value', 'url_menu_text')
+
+
+class ExecutionRetention:
+    """
+    [9-1] 执行记录清理器
+    """
+
+    JOB_ID = 'execution_retention'
+
+    def __init__(self):
+        self.app = None
+        self.lock = threading.Lock()
+        self.progress = {'running': False}
+
+    def init_app(self, app):
+        """
+        [9-1.1] 配置了保留天数时，在任务调度器中注册每日清理任务
+        """
+        from app.scheduler import task_scheduler
+
+        self.app = app
+        if self.retention_days() <= 0:
+            logger.info("未配置执行记录保留天数，不自动清理")
+            return
+
+        task_scheduler.scheduler.add_job(
+            func=self.run,
+            trigger='cron',
+            hour=app.config.get('EXECUTION_RETENTION_HOUR', 3),
+            id=self.JOB_ID,
+            name='Execution retention',
+            replace_existing=True
+        )
+        logger.info(f"执行记录保留 {self.retention_days()} 天，每天 "
+                    f"{app.config.get('EXECUTION_RETENTION_HOUR', 3)} 点清理")
+
+    def retention_days(self):
+        return self.app.config.get('EXECUTION_RETENTION_DAYS', 0)
+
+    def chunk_size(self):
+        return self.app.config.get('EXECUTION_RETENTION_CHUNK_SIZE', 1000)
+
+    def pause_seconds(self):
+        return self.app.config.get('EXECUTION_RETENTION_PAUSE_MS', 200) / 1000
+
+    def run(self):
+        """
+        [9-1.2] 按保留天数清理一次（调度器定时调用，或管理员手动触发）
+        同一时间只运行一次，已在运行时直接返回
+        """
+        if self.retention_days() <= 0:
+            return 0
+        if not self.lock.acquire(blocking=False):
+            logger.warning("执行记录清理正在进行，跳过本次")
+            return 0
+
+        # 只删除整天的明细：保留下来的最早一天是完整的，重建汇总时不会少算这一天
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days())).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        archive_dir = self.app.config.get('EXECUTION_ARCHIVE_DIR') or None
+        archive_path = None
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            archive_path = os.path.join(
+                archive_dir, f'task_executions_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv.gz')
+
+        self.progress = {
+            'running': True,
+            'cutoff': cutoff.strftime('%Y-%m-%d %H:%M:%S'),
+            'deleted': 0,
+            'chunks': 0,
+            'archive_file': archive_path,
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': None,
+            'error': None
+        }
+        logger.info(f"开始清理 {self.progress['cutoff']} 之前的执行记录")
+
+        try:
+            with self.app.app_context():
+                self.purge(TaskExecution.execution_time < cutoff, archive_path, self.progress)
+            logger.info(f"执行记录清理完成，共删除 {self.progress['deleted']} 条")
+            return self.progress['deleted']
+        except Exception as e:
+            self.progress['error'] = str(e)
+            logger.error(f"执行记录清理失败: {str(e)}")
+            return self.progress['deleted']
+        finally:
+            self.progress['running'] = False
+            self.progress['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.lock.release()
+
+    def run_in_background(self):
+        """
+        [9-1.3] 在后台线程中执行一次清理，已在运行时返回False
+        """
+        if self.progress['running']:
+            return False
+        threading.Thread(target=self.run, name='execution-retention', daemon=True).start()
+        return True
+
+    def purge_task(self, task_id):
+        """
+        [9-1.4] 分块删除指定任务的全部执行记录，返回删除条数
+        用户在页面上等待结果，块之间不停顿
+        """
+        progress = {'deleted': 0, 'chunks': 0}
+        self.purge(TaskExecution.task_id == task_id, progress=progress, pause=False)
+        return progress['deleted']
+
+    def purge(self, condition, archive_path=None, progress=None, pause=True):
+        """
+        [9-1.5] 分块删除满足条件的执行记录
+        每块按 (execution_time, id) 索引顺序取出最多 chunk_size 条，需要归档时先写入压缩文件，
+        再按主键顺序删除并提交；已删除的记录不会再被取到，所以不需要偏移量
+        """
+        chunk_size = self.chunk_size()
+        order = (TaskExecution.execution_time.asc(), TaskExecution.id.asc())
+
+        try:
+            while True:
+                if archive_path:
+                    records = TaskExecution.query.filter(condition).order_by(*order).limit(chunk_size).all()
+                    if records:
+                        self.archive(archive_path, records)
+                    ids = [record.id for record in records]
+                else:
+                    ids = [row.id for row in db.session.query(TaskExecution.id)
+                                                       .filter(condition)
+                                                       .order_by(*order)
+                                                       .limit(chunk_size).all()]
+                if not ids:
+                    break
+
+                db.session.execute(delete(TaskExecution).where(TaskExecution.id.in_(sorted(ids))),
+                                   execution_options={'synchronize_session': False})
+                db.session.commit()
+
+                if progress is not None:
+                    progress['deleted'] += len(ids)
+                    progress['chunks'] += 1
+                    if progress['chunks'] % 100 == 0:
+                        logger.info(f"清理执行记录: 已删除 {progress['deleted']} 条")
+
+                if len(ids) < chunk_size:
+                    break
+                if pause:
+                    # 让出数据库给调度器的写入
+                    time.sleep(self.pause_seconds())
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def archive(archive_path, records):
+        """
+        [9-1.6] 把一块记录追加到 gzip 压缩的CSV归档文件
+        每块单独压缩成一个gzip成员，合并后仍是合法的gzip文件
+        """
+        is_new = not os.path.exists(archive_path)
+        with gzip.open(archive_path, 'at', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(ARCHIVE_COLUMNS)
+            for record in records:
+                writer.writerow([getattr(record, column) for column in ARCHIVE_COLUMNS])
+
+    def stats(self):
+        """
+        [9-1.7] 最近一次清理的进度
+        """
+        return dict(self.progress)
+
+
+# [9-2] 全局清理器实例
+execution_retention = ExecutionRetention()
@@ -0,0 +1,126 @@
+"""
+[4-12] 文件分配
+把一次任务执行领取到的文件分配给各目标URL：
+先轮流发到每个目标的队列，保证每个文件只分配一次、不会因整除丢掉余数；
+某个目标的队列空了就从其他队列末尾“偷”文件。同一网站的上传流程是串行的，
+后开始的栏目还在排队时不能被先开始的栏目偷走文件，所以只从已开始上传的其他网站目标、
+或已结束的目标偷取；连续失败的目标停止上传，它剩下的文件由其他目标继续上传；
+全部目标结束后仍未上传的文件释放回文件池
+"""
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class FileDistributor:
+    """
+    [4-12.1] 单次任务执行的文件分配器
+    目标用下标区分，同一个URL出现多次时各自独立
+    """
+
+    def __init__(self, target_urls, file_ids, max_consecutive_failures=3):
+        """
+        [4-12.1.1] 轮流分配文件
+        """
+        self.target_urls = list(target_urls)
+        self.max_consecutive_failures = max_consecutive_failures
+        self.root_urls = [url.split('栏目值:')[0] for url in self.target_urls]
+        self.queues = [deque() for _ in self.target_urls]
+        for position, file_id in enumerate(file_ids):
+            self.queues[position % len(self.queues)].append(file_id)
+
+        self.consecutive_failures = [0] * len(self.target_urls)
+        self.stopped = [False] * len(self.target_urls)
+        self.started = [False] * len(self.target_urls)
+        self.active_count = len(self.target_urls)
+        self.lock = threading.Lock()
+
+    def start(self, index):
+        """
+        [4-12.1.2] 目标index已占用网站、开始上传，此后其他网站的目标可以偷它的文件
+        """
+        with self.lock:
+            self.started[index] = True
+
+    def next_file(self, index):
+        """
+        [4-12.1.3] 取目标index的下一个文件
+        自己的队列为空时从可偷取的最长队列末尾取；没有剩余文件或目标已停止时返回None
+        """
+        with self.lock:
+            if self.stopped[index]:
+                return None
+            if self.queues[index]:
+                return self.queues[index].popleft()
+
+            victims = [queue for other, queue in enumerate(self.queues)
+                       if other != index and queue and self.can_steal(index, other)]
+            if victims:
+                file_id = max(victims, key=len).pop()
+                logger.info(f"目标 {self.target_urls[index]} 接手了其他目标的文件 {file_id}")
+                return file_id
+            return None
+
+    def can_steal(self, index, other):
+        """
+        [4-12.1.4] 目标index能否偷目标other的文件（调用方持有锁）
+        other已结束时可以；other在上传中且不是同一网站时可以；
+        同一网站的other还在排队等待网站，偷走会让它开始时无文件可传
+        """
+        if self.stopped[other]:
+            return True
+        return self.started[other] and self.root_urls[other] != self.root_urls[index]
+
+    def remaining(self, index):
+        """
+        [4-12.1.5] 目标index队列中剩余的文件数
+        """
+        with self.lock:
+            return len(self.queues[index])
+
+    def report(self, index, success):
+        """
+        [4-12.1.6] 记录一次上传结果
+        连续失败达到上限时停止该目标，返回False表示不应再继续上传
+        """
+        with self.lock:
+            if success:
+                self.consecutive_failures[index] = 0
+                return True
+
+            self.consecutive_failures[index] += 1
+            if self.consecutive_failures[index] >= self.max_consecutive_failures:
+                self.stopped[index] = True
+                logger.warning(f"目标 {self.target_urls[index]} 连续失败 {self.consecutive_failures[index]} 次，停止上传")
+                return False
+            return True
+
+    def finish(self, index):
+        """
+        [4-12.1.7] 目标index的上传流程结束（完成、出错或停止）
+        最后一个结束的目标返回所有未上传的文件ID，由调用方释放回文件池，其余情况返回空列表
+        """
+        with self.lock:
+            self.stopped[index] = True
+            self.active_count -= 1
+            if self.active_count > 0:
+                return []
+
+            leftover = [file_id for queue in self.queues for file_id in queue]
+            for queue in self.queues:
+                queue.clear()
+            return leftover
+
+    def drain(self):
+        """
+        [4-12.1.8] 停止所有目标并取出全部尚未上传的文件ID（执行异常中止时使用）
+        之后各目标的 next_file 返回None，finish 不会再返回这些文件
+        """
+        with self.lock:
+            self.stopped = [True] * len(self.target_urls)
+            leftover = [file_id for queue in self.queues for file_id in queue]
+            for queue in self.queues:
+                queue.clear()
+            return leftover
@@ -0,0 +1,132 @@
+"""
+[11] 批量文件上传
+上传的文件由共享的线程池分块写入磁盘，写入时累计文件大小；
+文件记录按批次用多行INSERT保存，不再逐个创建ORM对象
+"""
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import db
+from app.models.file import File
+
+logger = logging.getLogger(__name__)
+
+# 每次从上传流读取并写入磁盘的字节数
+SAVE_CHUNK_SIZE = 64 * 1024
+
+
+class FileUploader:
+    """
+    [11-1] 文件上传保存器
+    所有请求共用一个线程池，同时写磁盘的线程数不超过 UPLOAD_SAVE_WORKERS
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('UPLOAD_SAVE_WORKERS', 8),
+                    thread_name_prefix='file-upload')
+                atexit.register(self.shutdown)
+            return self.executor
+
+    @staticmethod
+    def save_stream(stream, file_path):
+        """
+        [11-1.1] 把上传流分块写入磁盘，返回写入的字节数
+        """
+        file_size = 0
+        with open(file_path, 'wb') as f:
+            while True:
+                chunk = stream.read(SAVE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                file_size += len(chunk)
+        return file_size
+
+    def save_files(self, files, target_path, user_id, folder):
+        """
+        [11-1.2] 保存一批上传文件并写入文件记录
+        files 为已通过类型检查的 FileStorage 列表；同一批次中同名的文件只保存最后一个
+        返回每个文件的结果列表: {'filename', 'success', 'file_size', 'error'}
+        """
+        executor = self.get_executor()
+
+        # 同名文件写同一路径，只保留最后一个，避免多个线程同时写同一文件
+        latest = {}
+        for index, file in enumerate(files):
+            latest[os.path.basename(file.filename)] = index
+
+        results = []
+        pending = []
+        for index, file in enumerate(files):
+            original_filename = os.path.basename(file.filename)
+            if latest[original_filename] != index:
+                results.append({'filename': original_filename, 'success': False,
+                                'file_size': None, 'error': '同一批次中文件名重复'})
+                continue
+            file_path = os.path.join(target_path, original_filename)
+            result = {'filename': original_filename, 'success': False, 'file_size': None, 'error': None}
+            results.append(result)
+            pending.append((result, file_path, executor.submit(self.save_stream, file.stream, file_path)))
+
+        rows = []
+        for result, file_path, future in pending:
+            try:
+                result['file_size'] = future.result()
+            except Exception as e:
+                result['error'] = str(e)
+                logger.error(f"文件上传失败: {result['filename']}, 错误: {str(e)}")
+                continue
+            rows.append({
+                'user_id': user_id,
+                'original_filename': result['filename'],
+                'filename': result['filename'],
+                'file_path': file_path,
+                'file_size': result['file_size'],
+                'folder': File.normalize_folder(folder)
+            })
+
+        self.insert_rows(rows)
+        for result, _, _ in pending:
+            result['success'] = result['error'] is None
+        return results
+
+    @staticmethod
+    def insert_rows(rows):
+        """
+        [11-1.3] 每 UPLOAD_INSERT_BATCH 条一个多行INSERT，全部写入后一次提交
+        """
+        if not rows:
+            return
+        batch_size = current_app.config.get('UPLOAD_INSERT_BATCH', 500)
+        try:
+            for i in range(0, len(rows), batch_size):
+                db.session.execute(db.insert(File), rows[i:i + batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def shutdown(self):
+        """
+        [11-1.4] 关闭线程池
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# [11-2] 全局文件上传保存器实例
+file_uploader = FileUploader()
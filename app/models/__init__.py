@@ -5,7 +5,7 @@
 from .user import User
 from .file import File
 from .task import Task
-from .task_execution import TaskExecution
+from .task_execution import TaskExecution, TaskExecutionDaily, ExecutionStatus
 from .url_context import UrlUpdateContext
 
-__all__ = ['User', 'File', 'Task', 'TaskExecution', 'UrlUpdateContext'] 
\ No newline at end of file
+__all__ = ['User', 'File', 'Task', 'TaskExecution', 'TaskExecutionDaily', 'ExecutionStatus', 'UrlUpdateContext'] 
\ No newline at end of file
@@ -3,6 +3,7 @@
 管理用户上传的txt文件信息和执行状态
 """
 import os
+import re
 from datetime import datetime
 from app import db
 
@@ -12,6 +13,10 @@ class File(db.Model):
     存储用户上传文件的元信息和执行状态
     """
     __tablename__ = 'files'
+    __table_args__ = (
+        # 任务领取文件的查询键：按用户+文件夹定位，再按id顺序取未执行文件
+        db.Index('ix_files_claim', 'user_id', 'folder', 'is_executed', 'is_executing', 'id'),
+    )
     
     # [1-2.1.1] 文件基本信息字段
     id = db.Column(db.Integer, primary_key=True, comment='文件ID主键')
@@ -43,7 +48,29 @@ class File(db.Model):
         self.original_filename = original_filename
         self.file_path = file_path
         self.file_size = file_size
-        self.folder = folder
+        self.folder = self.normalize_folder(folder)
+
+    @staticmethod
+    def normalize_folder(folder):
+        """
+        [1-2.1.5] 规范化文件夹名称
+        根目录统一存为空字符串，去掉首尾空白和路径分隔符
+        """
+        return (folder or '').strip().strip('/\\')
+
+    @classmethod
+    def folder_from_path(cls, file_path, user_id):
+        """
+        [1-2.1.6] 从文件路径推导所属文件夹
+        路径结构为 <上传目录>/<用户ID>/[文件夹]/[executed]/<文件名>，兼容Linux和Windows分隔符
+        """
+        parts = [part for part in re.split(r'[\\/]+', file_path or '') if part]
+        directories = parts[:-1]
+        if directories and directories[-1] == 'executed':
+            directories = directories[:-1]
+        if not directories or directories[-1] == str(user_id):
+            return ''
+        return cls.normalize_folder(directories[-1])
     
     def read_content(self):
         """
@@ -73,23 +100,34 @@ class File(db.Model):
         [4-2.4] 移动文件到已执行文件夹
         保持文件系统的组织结构
         """
+        new_path = self.move_path_to_executed_folder(self.file_path, self.filename)
+        if new_path is None:
+            return False
+        self.file_path = new_path
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def move_path_to_executed_folder(file_path, filename):
+        """
+        [4-2.4.1] 只移动磁盘上的文件，不修改数据库
+        返回新路径，原文件不存在时返回None
+        """
         try:
             # 构建已执行文件夹路径
-            user_upload_dir = os.path.dirname(self.file_path)
+            user_upload_dir = os.path.dirname(file_path)
             executed_dir = os.path.join(user_upload_dir, 'executed')
             
             # 创建已执行文件夹（如果不存在）
             if not os.path.exists(executed_dir):
-                os.makedirs(executed_dir)
+                os.makedirs(executed_dir, exist_ok=True)
             
             # 移动文件
-            new_path = os.path.join(executed_dir, self.filename)
-            if os.path.exists(self.file_path):
-                os.rename(self.file_path, new_path)
-                self.file_path = new_path
-                db.session.commit()
-                return True
-            return False
+            new_path = os.path.join(executed_dir, filename)
+            if os.path.exists(file_path):
+                os.rename(file_path, new_path)
+                return new_path
+            return None
         except Exception as e:
             raise Exception(f"移动文件失败: {str(e)}")
     
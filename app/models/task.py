@@ -43,6 +43,8 @@ class Task(db.Model):
     # [1-3.1.6] 关联关系
     task_executions = db.relationship('TaskExecution', backref='task', lazy='dynamic',
                                     cascade='all, delete-orphan')
+    task_execution_daily = db.relationship('TaskExecutionDaily', lazy='dynamic',
+                                         cascade='all, delete-orphan')
     
     def __init__(self, user_id, task_name, target_url, execution_method, 
                  interval_seconds, start_time, end_time=None, source_folder=None,
@@ -106,75 +108,83 @@ class Task(db.Model):
         [4-1.1] 启动任务
         将任务状态设置为运行中
         """
+        old_status = self.status
         self.status = 'running'
         self.updated_at = datetime.utcnow()
         db.session.commit()
+        self.notify_status_changed(old_status)
     
     def pause_task(self):
         """
         [4-1.2] 暂停任务
         将任务状态设置为暂停
         """
+        old_status = self.status
         self.status = 'paused'
         self.updated_at = datetime.utcnow()
         db.session.commit()
+        self.notify_status_changed(old_status)
     
     def complete_task(self):
         """
         [4-1.3] 完成任务
         所有文件执行完毕后调用
         """
+        old_status = self.status
         self.status = 'completed'
         self.updated_at = datetime.utcnow()
         db.session.commit()
+        self.notify_status_changed(old_status)
     
     def fail_task(self, error_message=None):
         """
         [4-1.4] 任务执行失败
         遇到严重错误时调用
         """
+        old_status = self.status
         self.status = 'failed'
         self.updated_at = datetime.utcnow()
         db.session.commit()
+        self.notify_status_changed(old_status)
     
+    def notify_status_changed(self, old_status):
+        """
+        [4-1.4.1] 状态迁移后同步更新统计缓存
+        """
+        from app.stats import stats_service
+        stats_service.task_status_changed(old_status, self.status)
+
+    def get_source_folders(self):
+        """
+        [4-2.2] 获取任务的文件夹搜索顺序
+        主文件夹在前，备用文件夹按配置顺序在后
+        """
+        import json
+
+        folders = [self.source_folder] if self.source_folder else []
+        if self.backup_folders:
+            try:
+                folders.extend(json.loads(self.backup_folders))
+            except (ValueError, TypeError):
+                pass
+        # 去重并保持顺序，避免同一文件夹被重复搜索
+        return list(dict.fromkeys(folders))
+
     def get_next_file(self):
         """
         [4-2.1] 获取下一个待执行的文件
-        返回用户的第一个未执行文件
+        返回源文件夹中id最小的未执行文件
         """
         from .file import File
-        import os
-        
-        # 构建原生SQL查询
-        if self.source_folder:
-            # 如果指定了源文件夹，使用原生SQL查询
-            sql = """
-            SELECT * FROM files 
-            WHERE user_id = :user_id 
-            AND is_executed = 0 
-            AND (file_path LIKE :linux_pattern OR file_path LIKE :windows_pattern)
-            ORDER BY id ASC 
-            LIMIT 1
-            """
-            
-            # 构建路径模式
-            linux_pattern = f'%{os.sep}{self.source_folder}{os.sep}%'
-            windows_pattern = f'%\\\\{self.source_folder}\\\\%'
-            
-            # 执行原生SQL查询
-            result = db.session.execute(
-                db.text(sql), 
-                {
-                    'user_id': self.user_id,
-                    'linux_pattern': linux_pattern,
-                    'windows_pattern': windows_pattern
-                }
-            ).fetchone()
-            
-            # 将结果转换为File对象
-            if result:
-                return File.query.get(result.id)
+
+        if not self.source_folder:
             return None
+
+        return File.query.filter_by(
+            user_id=self.user_id,
+            folder=File.normalize_folder(self.source_folder),
+            is_executed=False
+        ).order_by(File.id.asc()).first()
     
     # def increment_executed_count(self):
     #     """
@@ -239,4 +249,14 @@ class Task(db.Model):
         """
         [1-3.3] 任务对象字符串表示
         """
-        return f'<Task {self.task_name} (User: {self.user_id}, Status: {self.status})>'
\ No newline at end of file
+        return f'<Task {self.task_name} (User: {self.user_id}, Status: {self.status})>'
+
+
+@db.event.listens_for(Task, 'after_insert')
+@db.event.listens_for(Task, 'after_delete')
+def task_count_changed(mapper, connection, target):
+    """
+    [1-3.4] 新建或删除任务后使统计缓存失效
+    """
+    from app.stats import stats_service
+    stats_service.tasks_changed()
@@ -2,17 +2,33 @@
 [1-4] 任务执行记录数据模型
 记录每次任务执行的详细信息和结果
 """
+import heapq
+import itertools
 from datetime import datetime
 from app import db
 from app.models.url_context import UrlUpdateContext
 
 
+class ExecutionStatus:
+    """
+    [1-4.0] 执行状态取值
+    调度器写入执行记录和统计读取时统一使用
+    """
+    SUCCESS = '200success'
+    FAILED = 'fails'
+
+
 class TaskExecution(db.Model):
     """
     [1-4.1] 任务执行记录模型类
     记录每次文件执行的详细信息
     """
     __tablename__ = 'task_executions'
+    # 按任务 / 全表按时间倒序分页（paginate_history）；统计读取每日汇总表，不需要明细上的统计索引
+    __table_args__ = (
+        db.Index('ix_task_executions_task_time', 'task_id', 'execution_time', 'id'),
+        db.Index('ix_task_executions_time', 'execution_time', 'id'),
+    )
     
     # [1-4.1.1] 执行记录基本字段
     id = db.Column(db.Integer, primary_key=True, comment='执行记录ID主键')
@@ -57,52 +73,45 @@ class TaskExecution(db.Model):
             统计数据列表，每个URL一条记录
         """
         from datetime import datetime, timedelta
-        from sqlalchemy import func
+        from sqlalchemy import func, case
 
         # 计算今天和昨天的日期范围
         today = datetime.now().date()
         yesterday = today - timedelta(days=1)
-        today_start = datetime.combine(today, datetime.min.time())
-        yesterday_start = datetime.combine(yesterday, datetime.min.time())
-        yesterday_end = datetime.combine(yesterday, datetime.max.time())
+
+        # 从每日汇总表一次分组查询得到每个(URL, 栏目值)的总数、昨天和今天的数量，
+        # 查询量只与任务的URL数和天数有关，与执行记录条数无关
+        daily = TaskExecutionDaily
+        rows = db.session.query(
+            daily.execute_url,
+            daily.url_menu_value,
+            func.sum(daily.count).label('total_count'),
+            func.sum(case((daily.day == yesterday, daily.count), else_=0)).label('yesterday_count'),
+            func.sum(case((daily.day >= today, daily.count), else_=0)).label('today_count')
+        ).filter(daily.task_id == task_id)\
+         .group_by(daily.execute_url, daily.url_menu_value)\
+         .all()
+        counts = {(row.execute_url, row.url_menu_value): row for row in rows}
+
+        # 一次联表查询得到所有栏目文本
+        menu_texts = UrlUpdateContext.get_menu_texts_by_root_urls(
+            config.get('url', '') for config in url_configs
+        )
 
         stats = []
 
         for config in url_configs:
             url = config.get('url', '')
             menu_value = config.get('menu_value', '')
-            menu_text = config.get('menu_text', '')
-
-            # 查询该URL和menu_value的所有执行记录
-            base_query = cls.query.filter_by(
-                task_id=task_id,
-                execute_url=url,
-                url_menu_value=menu_value
-            )
-
-            # 总执行数量
-            total_count = base_query.count()
-
-            # 昨天执行数量
-            yesterday_count = base_query.filter(
-                cls.execution_time >= yesterday_start,
-                cls.execution_time <= yesterday_end
-            ).count()
-
-            # 今天执行数量
-            today_count = base_query.filter(
-                cls.execution_time >= today_start
-            ).count()
-
-            menu_text = UrlUpdateContext.get_menu_text_by_root_url_and_menu_value(url, menu_value)
+            row = counts.get((url, menu_value))
 
             stats.append({
                 'url': url,
                 'menu_value': menu_value,
-                'menu_text': menu_text,
-                'total_count': total_count,
-                'yesterday_count': yesterday_count,
-                'today_count': today_count
+                'menu_text': menu_texts.get((url, menu_value)),
+                'total_count': int(row.total_count or 0) if row else 0,
+                'yesterday_count': int(row.yesterday_count or 0) if row else 0,
+                'today_count': int(row.today_count or 0) if row else 0
             })
 
         return stats
@@ -138,10 +147,83 @@ class TaskExecution(db.Model):
         [5-1.2] 获取任务执行历史记录
         管理员监控和用户查看历史时使用
         """
-        records = cls.query.filter_by(task_id=task_id)\
-                          .order_by(cls.execution_time.desc())\
-                          .limit(limit).all()
+        records, _ = cls.get_task_execution_page(task_id, limit=limit)
         return [record.get_execution_info() for record in records]
+
+    @staticmethod
+    def encode_cursor(record):
+        """
+        [5-1.2.1] 分页游标：执行时间_记录ID
+        """
+        return f"{record.execution_time.strftime('%Y%m%d%H%M%S%f')}_{record.id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        [5-1.2.2] 解析分页游标，格式错误时抛出ValueError
+        """
+        time_part, _, id_part = (cursor or '').partition('_')
+        return datetime.strptime(time_part, '%Y%m%d%H%M%S%f'), int(id_part)
+
+    @classmethod
+    def paginate_history(cls, query, cursor=None, limit=50):
+        """
+        [5-1.2.3] 按 (execution_time, id) 倒序的游标分页
+        从上一页最后一条记录之后继续取，不使用OFFSET，翻到多深都只读取limit条索引记录
+        返回 (记录列表, 下一页游标)，没有下一页时游标为None
+        """
+        records = cls.page_query(query, cursor, limit).all()
+        return cls.cut_page(records, limit)
+
+    @classmethod
+    def page_query(cls, query, cursor, limit):
+        """
+        [5-1.2.3.1] 在查询上加游标条件、倒序排序和 limit+1（多取一条判断是否有下一页）
+        """
+        if cursor:
+            execution_time, record_id = cls.decode_cursor(cursor)
+            query = query.filter(db.or_(
+                cls.execution_time < execution_time,
+                db.and_(cls.execution_time == execution_time, cls.id < record_id)
+            ))
+        return query.order_by(cls.execution_time.desc(), cls.id.desc()).limit(limit + 1)
+
+    @classmethod
+    def cut_page(cls, records, limit):
+        """
+        [5-1.2.3.2] 截取一页记录并生成下一页游标
+        """
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = cls.encode_cursor(records[-1])
+        return records, next_cursor
+
+    @classmethod
+    def get_task_execution_page(cls, task_id, cursor=None, limit=50):
+        """
+        [5-1.2.4] 任务执行历史的一页，走 ix_task_executions_task_time 索引
+        """
+        return cls.paginate_history(cls.query.filter(cls.task_id == task_id), cursor, limit)
+
+    @classmethod
+    def get_user_execution_page(cls, user_id, cursor=None, limit=50):
+        """
+        [5-1.2.5] 用户所有任务执行历史的一页
+        task_id IN (...) 无法按索引顺序读取多个任务的记录，会扫描用户的全部执行记录再排序；
+        因此每个任务单独按 ix_task_executions_task_time 索引取游标之后的 limit+1 条，
+        再按 (execution_time, id) 倒序归并，每页读取的记录数只与任务数和limit有关
+        """
+        from .task import Task
+
+        task_ids = [row.id for row in db.session.query(Task.id).filter(Task.user_id == user_id).all()]
+        if not task_ids:
+            return [], None
+
+        per_task = [cls.page_query(cls.query.filter(cls.task_id == task_id), cursor, limit).all()
+                    for task_id in task_ids]
+        merged = heapq.merge(*per_task, key=lambda record: (record.execution_time, record.id), reverse=True)
+        return cls.cut_page(list(itertools.islice(merged, limit + 1)), limit)
     
     @classmethod
     def get_user_execution_stats(cls, user_id):
@@ -149,23 +231,45 @@ class TaskExecution(db.Model):
         [5-1.3] 获取用户执行统计信息
         管理员监控时使用
         """
+        return cls.get_users_execution_stats([user_id])[user_id]
+
+    @classmethod
+    def get_users_execution_stats(cls, user_ids):
+        """
+        [5-1.3.1] 批量获取多个用户的执行统计信息
+        一次按用户分组的查询（读每日汇总表），返回 {user_id: 统计字典}
+        """
         from .task import Task
-        
-        # 查询用户的所有任务执行记录
-        records = db.session.query(cls)\
-                           .join(Task, cls.task_id == Task.id)\
-                           .filter(Task.user_id == user_id).all()
-        
-        total_executions = len(records)
-        success_executions = len([r for r in records if r.status == 'success'])
-        failed_executions = total_executions - success_executions
-        
-        return {
-            'total_executions': total_executions,
-            'success_executions': success_executions,
-            'failed_executions': failed_executions,
-            'success_rate': round((success_executions / total_executions * 100), 2) if total_executions > 0 else 0
-        }
+        from sqlalchemy import func, case
+
+        user_ids = list(user_ids)
+        rows = []
+        if user_ids:
+            daily = TaskExecutionDaily
+            rows = db.session.query(
+                Task.user_id,
+                func.sum(daily.count).label('total_executions'),
+                func.sum(case((daily.status == ExecutionStatus.SUCCESS, daily.count), else_=0)).label('success_executions')
+            ).join(Task, daily.task_id == Task.id)\
+             .filter(Task.user_id.in_(user_ids))\
+             .group_by(Task.user_id)\
+             .all()
+        counts = {row.user_id: row for row in rows}
+
+        stats = {}
+        for user_id in user_ids:
+            row = counts.get(user_id)
+            total_executions = int(row.total_executions or 0) if row else 0
+            success_executions = int(row.success_executions or 0) if row else 0
+            failed_executions = total_executions - success_executions
+
+            stats[user_id] = {
+                'total_executions': total_executions,
+                'success_executions': success_executions,
+                'failed_executions': failed_executions,
+                'success_rate': round((success_executions / total_executions * 100), 2) if total_executions > 0 else 0
+            }
+        return stats
     
 
     
@@ -173,4 +277,107 @@ class TaskExecution(db.Model):
         """
         [1-4.3] 执行记录对象字符串表示
         """
-        return f'<TaskExecution Task:{self.task_id} File:{self.file_id} Status:{self.status}>'
\ No newline at end of file
+        return f'<TaskExecution Task:{self.task_id} File:{self.file_id} Status:{self.status}>'
+
+
+class TaskExecutionDaily(db.Model):
+    """
+    [1-4.4] 执行记录每日汇总模型类
+    按 (任务, URL, 栏目值, 日期, 状态) 累计执行次数，写入执行记录时同步累加，
+    统计查询读这张表，不再扫描不断增长的 task_executions
+    """
+    __tablename__ = 'task_execution_daily'
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'execute_url', 'url_menu_value', 'day', 'status',
+                            name='uq_task_execution_daily'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, comment='主键ID')
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False, comment='所属任务ID')
+    execute_url = db.Column(db.String(500), nullable=False, default='', comment='执行的目标URL')
+    url_menu_value = db.Column(db.String(100), nullable=False, default='', comment='URL栏目值')
+    day = db.Column(db.Date, nullable=False, comment='执行日期（与execution_time相同的时区）')
+    status = db.Column(db.String(100), nullable=False, default='', comment='执行状态')
+    count = db.Column(db.Integer, nullable=False, default=0, comment='执行次数')
+
+    @staticmethod
+    def key_of(execution):
+        """
+        [1-4.4.1] 执行记录（列值字典）对应的汇总键
+        """
+        execution_time = execution.get('execution_time') or datetime.utcnow()
+        return (
+            execution['task_id'],
+            execution.get('execute_url') or '',
+            execution.get('url_menu_value') or '',
+            execution_time.date(),
+            execution.get('status') or ''
+        )
+
+    @classmethod
+    def increment(cls, executions):
+        """
+        [1-4.4.2] 按一批执行记录累加汇总计数
+        同一批内先在内存中合并，再用一条 INSERT ... ON DUPLICATE KEY UPDATE 写入（MySQL），
+        由调用方在写入执行记录的同一个事务中调用并提交
+        """
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        counts = {}
+        for execution in executions:
+            key = cls.key_of(execution)
+            counts[key] = counts.get(key, 0) + 1
+        if not counts:
+            return
+
+        rows = [
+            {'task_id': task_id, 'execute_url': execute_url, 'url_menu_value': url_menu_value,
+             'day': day, 'status': status, 'count': count}
+            for (task_id, execute_url, url_menu_value, day, status), count in counts.items()
+        ]
+        stmt = mysql_insert(cls).values(rows)
+        stmt = stmt.on_duplicate_key_update(count=cls.count + stmt.inserted.count)
+        db.session.execute(stmt)
+
+    @classmethod
+    def total_count(cls):
+        """
+        [1-4.4.3] 全部执行记录数
+        """
+        from sqlalchemy import func
+        return int(db.session.query(func.sum(cls.count)).scalar() or 0)
+
+    @classmethod
+    def rebuild(cls, task_id=None):
+        """
+        [1-4.4.4] 根据 task_executions 重建汇总数据
+        不指定task_id时重建全部任务，返回写入的汇总行数；由调用方提交。
+        早于保留天数的明细已被清理，那些日期的汇总是唯一的历史数据：
+        每个任务只删除并重建明细中最早一天及之后的汇总，没有明细的任务不做改动
+        """
+        task_filter = 'WHERE task_id = :task_id' if task_id is not None else ''
+        db.session.execute(db.text(f"""
+        DELETE d FROM task_execution_daily d
+        JOIN (SELECT task_id, DATE(MIN(execution_time)) AS first_day
+              FROM task_executions
+              {task_filter}
+              GROUP BY task_id) f
+          ON d.task_id = f.task_id AND d.day >= f.first_day
+        """), {'task_id': task_id})
+
+        result = db.session.execute(db.text(f"""
+        INSERT INTO task_execution_daily (task_id, execute_url, url_menu_value, day, status, count)
+        SELECT task_id, COALESCE(execute_url, ''), COALESCE(url_menu_value, ''),
+               DATE(execution_time), COALESCE(status, ''), COUNT(*)
+        FROM task_executions
+        {task_filter}
+        GROUP BY task_id, COALESCE(execute_url, ''), COALESCE(url_menu_value, ''),
+                 DATE(execution_time), COALESCE(status, '')
+        """), {'task_id': task_id})
+        return result.rowcount
+
+    def __repr__(self):
+        """
+        [1-4.4.5] 汇总对象字符串表示
+        """
+        return f'<TaskExecutionDaily Task:{self.task_id} {self.day} {self.status}:{self.count}>'
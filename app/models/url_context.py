@@ -2,9 +2,13 @@
 URL上下文数据模型
 用于管理URL更新上下文和菜单数据
 """
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
 from urllib.parse import urljoin
 import requests
+from flask import current_app
 from app import db
 
 
@@ -17,7 +21,7 @@ class UrlUpdateContext(db.Model):
     
     id = db.Column(db.Integer, primary_key=True, comment='主键ID')
     name = db.Column(db.String(100), nullable=True, comment='URL名称')
-    root_url = db.Column(db.String(255), nullable=False, comment='根域名')
+    root_url = db.Column(db.String(255), nullable=False, index=True, comment='根域名')
     suffix = db.Column(db.String(255), nullable=False, comment='后缀路径')
     username = db.Column(db.String(80), nullable=False, comment='用户名')
     password = db.Column(db.String(128), nullable=False, comment='密码')
@@ -47,6 +51,7 @@ class UrlUpdateContext(db.Model):
     def get_menu_text_by_root_url_and_menu_value(root_url, menu_value):
         """
         根据root_url和menu_value获取menu_text
+        从网站目录缓存读取，同一root_url有多条配置时只取第一条
         
         Args:
             root_url (str): 根域名
@@ -55,18 +60,99 @@ class UrlUpdateContext(db.Model):
         Returns:
             str or None: 菜单文本，如果未找到则返回None
         """
-        # 首先根据root_url找到对应的上下文
-        context = UrlUpdateContext.query.filter_by(root_url=root_url).first()
-        if not context:
+        site = site_directory.get_site(root_url)
+        if not site:
             return None
-        
-        # 根据上下文ID和menu_value查找对应的菜单
-        menu = UrlMenu.query.filter_by(
-            context_id=context.id,
-            menu_value=menu_value
-        ).first()
-        
-        return menu.menu_text if menu else None
+        return site.menus.get(menu_value)
+
+    @staticmethod
+    def get_menu_texts_by_root_urls(root_urls):
+        """
+        批量获取多个网站的菜单文本
+        与 get_menu_text_by_root_url_and_menu_value 一致：同一root_url有多条配置时只取第一条
+
+        Args:
+            root_urls (iterable): 根域名列表
+
+        Returns:
+            dict: {(root_url, menu_value): menu_text}
+        """
+        menu_texts = {}
+        for root_url, site in site_directory.get_sites(root_urls).items():
+            if site:
+                for menu_value, menu_text in site.menus.items():
+                    menu_texts[(root_url, menu_value)] = menu_text
+        return menu_texts
+    
+    @staticmethod
+    def get_existing_pairs(pairs):
+        """
+        批量检查哪些 (root_url, suffix) 已存在，按root_url分批查询（走root_url索引）
+
+        Args:
+            pairs (iterable): (root_url, suffix) 列表
+
+        Returns:
+            set: 已存在的 (root_url, suffix)
+        """
+        pairs = set(pairs)
+        root_urls = list({root_url for root_url, _ in pairs})
+        existing = set()
+        for i in range(0, len(root_urls), SiteDirectory.LOAD_BATCH_SIZE):
+            rows = db.session.query(UrlUpdateContext.root_url, UrlUpdateContext.suffix)\
+                             .filter(UrlUpdateContext.root_url.in_(root_urls[i:i + SiteDirectory.LOAD_BATCH_SIZE]))\
+                             .all()
+            existing.update((row.root_url, row.suffix) for row in rows if (row.root_url, row.suffix) in pairs)
+        return existing
+
+    @staticmethod
+    def bulk_create(records):
+        """
+        批量添加URL上下文及其菜单，多行INSERT，不逐条flush；调用方负责提交事务和清空网站目录缓存
+        调用前应已用 get_existing_pairs 排除已存在的 (root_url, suffix)
+
+        Args:
+            records (list): dict列表，包含 name, root_url, suffix, username, password, menus（[[menu_value, menu_text], ...]）
+
+        Returns:
+            int: 添加的URL上下文数量
+        """
+        if not records:
+            return 0
+
+        now = datetime.utcnow()
+        db.session.execute(db.insert(UrlUpdateContext), [{
+            'name': record['name'],
+            'root_url': record['root_url'],
+            'suffix': record['suffix'],
+            'username': record['username'],
+            'password': record['password'],
+            'created_at': now
+        } for record in records])
+
+        # 多行INSERT不返回自增ID，按 (root_url, suffix) 查回新记录的ID
+        pairs = [(record['root_url'], record['suffix']) for record in records]
+        context_ids = {}
+        for i in range(0, len(pairs), SiteDirectory.LOAD_BATCH_SIZE):
+            rows = db.session.query(UrlUpdateContext.id, UrlUpdateContext.root_url, UrlUpdateContext.suffix)\
+                             .filter(db.tuple_(UrlUpdateContext.root_url, UrlUpdateContext.suffix)
+                                     .in_(pairs[i:i + SiteDirectory.LOAD_BATCH_SIZE]))\
+                             .all()
+            for row in rows:
+                # 同一对有多条时取最新插入的一条
+                key = (row.root_url, row.suffix)
+                context_ids[key] = max(row.id, context_ids.get(key, 0))
+
+        menus = [{
+            'context_id': context_ids[(record['root_url'], record['suffix'])],
+            'menu_value': menu_value,
+            'menu_text': menu_text,
+            'created_at': now
+        } for record in records for menu_value, menu_text in record['menus']]
+        if menus:
+            db.session.execute(db.insert(UrlMenu), menus)
+
+        return len(records)
     
     def __repr__(self):
         return f'<UrlUpdateContext {self.root_url}{self.suffix}>'
@@ -89,6 +175,107 @@ class UrlMenu(db.Model):
         return f'<UrlMenu {self.menu_value}: {self.menu_text}>'
 
 
+# 网站目录中的一条网站配置，menus 为 {menu_value: menu_text}
+SiteEntry = namedtuple('SiteEntry', ['context_id', 'root_url', 'suffix', 'username', 'password', 'menus'])
+
+
+class SiteDirectory:
+    """
+    网站目录缓存
+    按root_url缓存网站配置和栏目，上传和统计时从内存读取，不再逐个查询 url_update_contexts / url_menus；
+    未命中的root_url批量加载（两条查询），不存在的root_url也会缓存，
+    增删改网站配置后调用 invalidate 清空
+    """
+
+    # 每次 IN 查询的root_url / 上下文ID数量
+    LOAD_BATCH_SIZE = 500
+
+    def __init__(self):
+        self.sites = {}
+        self.lock = threading.Lock()
+        # 每次清空加一，加载期间发生清空时丢弃加载结果，避免缓存旧数据
+        self.generation = 0
+
+    @staticmethod
+    def cache_ttl():
+        return current_app.config.get('SITE_DIRECTORY_CACHE_TTL', 300)
+
+    def get_site(self, root_url):
+        """
+        获取一个网站的配置，未配置时返回None
+        """
+        return self.get_sites([root_url]).get(root_url)
+
+    def get_sites(self, root_urls):
+        """
+        批量获取网站配置，返回 {root_url: SiteEntry 或 None}
+        """
+        sites = {}
+        missing = []
+        now = time.monotonic()
+        with self.lock:
+            for root_url in set(root_urls):
+                entry = self.sites.get(root_url)
+                if entry is not None and entry[1] > now:
+                    sites[root_url] = entry[0]
+                else:
+                    missing.append(root_url)
+            generation = self.generation
+
+        if missing:
+            loaded = self.load(missing)
+            expires_at = time.monotonic() + self.cache_ttl()
+            with self.lock:
+                cacheable = generation == self.generation
+                for root_url in missing:
+                    sites[root_url] = loaded.get(root_url)
+                    if cacheable:
+                        self.sites[root_url] = (sites[root_url], expires_at)
+        return sites
+
+    def load(self, root_urls):
+        """
+        从数据库批量加载网站配置和栏目，同一root_url有多条配置时取ID最小的一条
+        """
+        contexts = {}
+        for i in range(0, len(root_urls), self.LOAD_BATCH_SIZE):
+            rows = db.session.query(UrlUpdateContext.id, UrlUpdateContext.root_url, UrlUpdateContext.suffix,
+                                    UrlUpdateContext.username, UrlUpdateContext.password)\
+                             .filter(UrlUpdateContext.root_url.in_(root_urls[i:i + self.LOAD_BATCH_SIZE]))\
+                             .order_by(UrlUpdateContext.id.asc())\
+                             .all()
+            for row in rows:
+                contexts.setdefault(row.root_url, row)
+
+        menus = {}
+        context_ids = [row.id for row in contexts.values()]
+        for i in range(0, len(context_ids), self.LOAD_BATCH_SIZE):
+            rows = db.session.query(UrlMenu.context_id, UrlMenu.menu_value, UrlMenu.menu_text)\
+                             .filter(UrlMenu.context_id.in_(context_ids[i:i + self.LOAD_BATCH_SIZE]))\
+                             .order_by(UrlMenu.id.asc())\
+                             .all()
+            for row in rows:
+                menus.setdefault(row.context_id, {}).setdefault(row.menu_value, row.menu_text)
+
+        return {
+            root_url: SiteEntry(row.id, row.root_url, row.suffix, row.username, row.password,
+                                menus.get(row.id, {}))
+            for root_url, row in contexts.items()
+        }
+
+    def invalidate(self):
+        """
+        清空缓存，网站配置或栏目变更并提交后调用
+        """
+        with self.lock:
+            self.sites.clear()
+            self.generation += 1
+
+
+# 全局网站目录缓存实例
+site_directory = SiteDirectory()
+
+
 class BatchUrlFind(db.Model):
     """
     批量URL查询结果模型
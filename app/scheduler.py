@@ -2,10 +2,8 @@
 [任务调度系统]
 使用APScheduler实现定时任务的调度和执行
 """
-import requests
 import logging
 import threading
-import time
 from datetime import datetime, time as dt_time, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
@@ -13,18 +11,21 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from app.models.task import Task
 from app.models.file import File
-from app.models.task_execution import TaskExecution
-from app.models.url_context import UrlUpdateContext
+from app.models.task_execution import ExecutionStatus
+from app.models.url_context import site_directory
 from app import db, socketio
 import test
 from app.models.url_context import url_update_context
+from app.claim_queue import TaskClaimQueue
+from app.async_engine import AsyncUploadEngine
+from app.upload_pacer import UploadPacer, SitePipeline
+from app.file_distributor import FileDistributor
+from app.start_ramp import StartRamp
+from app.execution_recorder import ExecutionRecorder
 # [4] 任务调度器初始化
 scheduler = BackgroundScheduler()
 logger = logging.getLogger(__name__)
 
-# 全局session锁，用于管理同一网站的并发访问
-session_locks = {}
-session_lock = threading.Lock()
 # from sqlalchemy.orm import sessionmaker
 # SessionLocal = sessionmaker(bind=db.engine)
 
@@ -42,6 +43,17 @@ class TaskScheduler:
         """
         self.app = app
         self.scheduler = scheduler
+        # 每个任务的文件领取队列 {task_id: TaskClaimQueue}
+        self.claim_queues = {}
+        self.claim_queues_lock = threading.Lock()
+        # 线程池引擎的节奏控制器（延时队列 + 工作线程池），首次使用时才启动
+        self.upload_pacer = UploadPacer(self)
+        # 执行记录批量写入器
+        self.execution_recorder = ExecutionRecorder(self)
+        # 上传流程的启动节奏（令牌桶）
+        self.start_ramp = StartRamp(self)
+        # 可选的asyncio上传引擎，首次使用时才启动事件循环
+        self.async_engine = AsyncUploadEngine(self)
         if app is not None:
             self.init_app(app)
     
@@ -70,6 +82,10 @@ class TaskScheduler:
         # [4-1.5] 应用关闭时停止调度器
         import atexit
         atexit.register(lambda: self.scheduler.shutdown())
+        # atexit按注册的相反顺序执行：先停止上传引擎，最后写入缓冲中的执行记录
+        atexit.register(self.execution_recorder.shutdown)
+        atexit.register(self.upload_pacer.shutdown)
+        atexit.register(self.async_engine.shutdown)
     
     def add_task_job(self, task):
         """
@@ -119,12 +135,29 @@ class TaskScheduler:
         [4-1.10] 从调度器移除任务
         暂停或停止任务时调用
         """
-        # todo 增加is_excuting字段要改回0！！！
         job_id = f"task_{task_id}"
         if self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
             logger.info(f"任务 (ID: {task_id}) 已从调度器移除")
 
+        # 释放该任务预留但未使用的文件
+        with self.claim_queues_lock:
+            claim_queue = self.claim_queues.pop(task_id, None)
+        if claim_queue:
+            claim_queue.release()
+
+    def get_claim_queue(self, task_id):
+        """
+        [4-1.11] 获取任务的文件领取队列
+        不存在时创建
+        """
+        with self.claim_queues_lock:
+            claim_queue = self.claim_queues.get(task_id)
+            if claim_queue is None:
+                claim_queue = TaskClaimQueue(self, task_id)
+                self.claim_queues[task_id] = claim_queue
+            return claim_queue
+
     def execute_task(self, task_id):
         """
         [4-2] 执行单个任务
@@ -176,334 +209,359 @@ class TaskScheduler:
     def get_files_safely(self, task, target_urls):
         """
         [4-2.3.1] 安全获取文件列表
-        使用数据库锁防止文件竞争
+        从任务的领取队列取出本轮需要的文件（通常已在上一轮执行期间预取好），
+        每日重复执行的任务随后在后台预取下一轮的文件
         """
-        from app.models.file import File
-        import threading
-        import time
-        
-        files_to_execute = []
         total_files_needed = task.daily_execution_count * len(target_urls)
-        
-        # 使用数据库事务确保原子性
-        for _ in range(total_files_needed):
-            file_obj = self.get_next_file_atomically(task)
-            if file_obj:
-                files_to_execute.append(file_obj)
-            else:
-                logger.info(f"没有更多文件可执行，暂停任务 {task.task_name}")
-                print(f"--------------------------------没有更多文件可执行，暂停任务 {task.task_name}")
-                task.pause_task()
-                self.remove_task_job(task.id)
-                break
-        
+
+        claim_queue = self.get_claim_queue(task.id)
+        files_to_execute = self.load_files(claim_queue.take(total_files_needed))
+
+        if len(files_to_execute) < total_files_needed:
+            logger.info(f"没有更多文件可执行，暂停任务 {task.task_name}")
+            print(f"--------------------------------没有更多文件可执行，暂停任务 {task.task_name}")
+            task.pause_task()
+            self.remove_task_job(task.id)
+        elif task.daily_start_time:
+            # 只执行一次的任务不预取，避免文件被长期预留
+            claim_queue.prefetch(total_files_needed)
+
         return files_to_execute
 
     def get_next_file_atomically(self, task):
         """
         [4-2.3.2] 原子性获取下一个文件
-        使用数据库锁和事务确保文件不会被重复分配
-        优先从主文件夹获取，不足时从备用文件夹获取
+        等价于批量领取一个文件
         """
-        from app.models.file import File
-        import os
-        import json
+        files = self.claim_files_batch(task, 1)
+        return files[0] if files else None
 
-        # 获取数据库会话
-        def get_session_local():
-            """动态获取 SessionLocal，确保在应用上下文中创建"""
-            from sqlalchemy.orm import sessionmaker
-            return sessionmaker(bind=db.engine)
+    def claim_files_batch(self, task, limit):
+        """
+        [4-2.3.3] 批量原子性领取文件
+        返回完整加载的File对象，顺序与领取顺序一致
+        """
+        return self.load_files(self.claim_file_ids(task, limit))
 
-        dbsession = get_session_local()()
+    def claim_file_ids(self, task, limit):
+        """
+        [4-2.3.4] 批量原子性领取文件ID
+        在一个事务内用 FOR UPDATE SKIP LOCKED 锁定最多 limit 个文件，
+        再用一条 UPDATE 把它们全部标记为正在执行，被其他任务锁住的行直接跳过
+        优先从主文件夹获取，不足时按顺序从备用文件夹补齐
+        """
+        from sqlalchemy.orm import sessionmaker
+
+        if limit <= 0 or not task.source_folder:
+            return []
+
+        # 走 ix_files_claim(user_id, folder, is_executed, is_executing, id) 索引，
+        # 按id顺序取前N行即可停止，不需要扫描用户的全部文件
+        # SKIP LOCKED：并发领取时跳过已被其他事务锁定的行（MySQL 8.0+）
+        select_sql = db.text("""
+        SELECT id FROM files
+        WHERE user_id = :user_id
+        AND folder = :folder
+        AND is_executed = 0
+        AND is_executing = 0
+        ORDER BY id ASC
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+        """)
+
+        update_sql = db.text("""
+        UPDATE files
+        SET is_executing = 1
+        WHERE id IN :file_ids AND is_executed = 0 AND is_executing = 0
+        """).bindparams(db.bindparam('file_ids', expanding=True))
+
+        file_ids = []
+        dbsession = sessionmaker(bind=db.engine)()
+        try:
+            with dbsession.begin():
+                for folder in task.get_source_folders():
+                    remaining = limit - len(file_ids)
+                    if remaining <= 0:
+                        break
+                    rows = dbsession.execute(select_sql, {
+                        'user_id': task.user_id,
+                        'folder': File.normalize_folder(folder),
+                        'limit': remaining
+                    }).fetchall()
+                    file_ids.extend(row.id for row in rows)
+
+                if file_ids:
+                    dbsession.execute(update_sql, {'file_ids': file_ids})
+        except Exception as e:
+            logger.error(f"批量领取文件时发生错误: {str(e)}")
+            return []
+        finally:
+            dbsession.close()
+
+        return file_ids
+
+    def load_files(self, file_ids):
+        """
+        [4-2.3.5] 按ID批量加载File对象
+        一次查询，保持传入的ID顺序
+        """
+        if not file_ids:
+            return []
 
-        
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                # 使用普通事务，不使用嵌套事务
-                with dbsession.begin():
-                    # 使用SELECT FOR UPDATE锁定文件记录
-                    if task.source_folder:
-                        # 构建文件夹列表：主文件夹 + 备用文件夹
-                        folders_to_search = [task.source_folder]
-                        if task.backup_folders:
-                            try:
-                                backup_list = json.loads(task.backup_folders)
-                                folders_to_search.extend(backup_list)
-                            except:
-                                pass
-                        
-                        # 构建SQL的LIKE条件
-                        like_conditions = []
-                        params = {'user_id': task.user_id}
-                        
-                        for idx, folder in enumerate(folders_to_search):
-                            linux_key = f'linux_pattern_{idx}'
-                            windows_key = f'windows_pattern_{idx}'
-                            params[linux_key] = f'%{os.sep}{folder}{os.sep}%'
-                            params[windows_key] = f'%\\\\{folder}\\\\%'
-                            like_conditions.append(f'(file_path LIKE :{linux_key} OR file_path LIKE :{windows_key})')
-                        
-                        where_clause = ' OR '.join(like_conditions)
-
-                        # FOR UPDATE是 行级锁
-                        sql = f"""
-                        SELECT * FROM files 
-                        WHERE user_id = :user_id 
-                        AND is_executed = 0 
-                        AND is_executing = 0
-                        AND ({where_clause})
-                        ORDER BY id ASC 
-                        LIMIT 1
-                        FOR UPDATE
-                        """
-                        
-                        result = dbsession.execute(db.text(sql), params).fetchone()
-
-                    if result:
-                        file_id = result.id
-                        
-                        # 更新文件状态为正在处理
-                        update_sql = """
-                        UPDATE files 
-                        SET is_executing = 1
-                        WHERE id = :file_id AND is_executed = 0 AND is_executing = 0
-                        """
-                        
-                        update_result = dbsession.execute(
-                            db.text(update_sql), 
-                            {'file_id': file_id}
-                        )
-                        
-                        if update_result.rowcount > 0:
-                            # 事务会自动提交，返回文件对象
-                            return File.query.get(file_id)
-                        else:
-                            # 文件已被其他任务获取，重试
-                            retry_count += 1
-                            time.sleep(0.1)
-                            continue
-                    else:
-                        return None
-                        
-            except Exception as e:
-                logger.error(f"获取文件时发生错误: {str(e)}")
-                retry_count += 1
-                time.sleep(0.1)
-                continue
-        
-        return None
+        files_by_id = {f.id: f for f in File.query.filter(File.id.in_(file_ids)).all()}
+        return [files_by_id[file_id] for file_id in file_ids if file_id in files_by_id]
+
+    def release_file_ids(self, file_ids):
+        """
+        [4-2.3.6] 释放预留的文件
+        把未执行文件的 is_executing 改回0，让其他任务可以领取
+        """
+        if not file_ids:
+            return
+
+        try:
+            File.query.filter(
+                File.id.in_(file_ids),
+                File.is_executed == False
+            ).update({'is_executing': False}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"释放预留文件时发生错误: {str(e)}")
 
     def execute_parallel_uploads(self, task, files, target_urls):
         """
         [4-3] 并行执行文件上传
-        使用线程池限制并发数量
+        按配置选择上传引擎：默认线程池（thread），可选asyncio事件循环（asyncio）
+        两种引擎都在提交各网站的上传流程后立即返回；asyncio引擎返回 concurrent.futures.Future
         """
-        import concurrent.futures
-        
-        # 从应用配置中读取线程池大小
-        max_workers = self.app.config.get('MAX_WORKERS', 100)
-        
+        task_info = {
+            'id': task.id,
+            'user_id': task.user_id,
+            'interval_seconds': task.interval_seconds
+        }
 
-        
-        def upload_to_target(target_url, file_objs):
-            """
-            上传文件到指定目标URL
-            """
-            # 在子线程中创建应用上下文
-                # 想象Flask应用上下文就像一个"工作环境"，在这个环境里你才能：
-                # 连接数据库
-                # 使用Flask的ORM功能
-                # 访问应用配置
-                # 没有这个环境，就像在没有网络的地方尝试上网一样，会报错。
-                # 所以 with self.app.app_context(): 就是在子线程中"搭建"这个工作环境，让数据库操作能够正常进行
-            def get_session_local():
-                """动态获取 SessionLocal，确保在应用上下文中创建"""
-                from sqlalchemy.orm import sessionmaker
-                return sessionmaker(bind=db.engine)
-            with self.app.app_context():
-
-                # 第一个括号 ()：调用 get_session_local() 函数，返回一个 sessionmaker 对象
-                # 第二个括号 ()：调用返回的 sessionmaker 对象，创建一个新的数据库会话
-                dbsession = get_session_local()()
+        # 每个文件只分配给一个目标，队列空了的目标可以接手其他目标的文件
+        distributor = FileDistributor(
+            target_urls,
+            [f.id for f in files],
+            self.app.config.get('UPLOAD_MAX_CONSECUTIVE_FAILURES', 3)
+        )
 
-                try:
-                    # 解析URL获取网站信息
-                    url_parts = target_url.split('栏目值:')
-                    if len(url_parts) != 2:
-                        logger.error(f"URL格式错误: {target_url}")
-                        return False, None, "URL格式错误"
-                    
-                    root_url = url_parts[0]
-                    menu_value = url_parts[1]
-                    menu_text = UrlUpdateContext.get_menu_text_by_root_url_and_menu_value(root_url, menu_value)
-                    
-                    # 获取网站配置信息，返回UrlUpdateContext对象实例
-                    url_context = UrlUpdateContext.query.filter_by(root_url=root_url).first()
-                    if not url_context:
-                        logger.error(f"未找到URL配置: {root_url}")
-                        return False, None, "未找到URL配置"
-                    
-                    # 使用网站锁确保同一网站的请求串行执行
-                    with self.get_site_lock(root_url):
-
-                        # 创建session，并且登录
-
-                        # [4-5.1] 创建session上下文
-                        
-                        session = requests.Session()
-                        upload_date = url_update_context(session, url_context.root_url, url_context.suffix, url_context.username, url_context.password)
-
-                        # [4-5.2] 执行upload_before逻辑
-                        zixun_page,ifGBK = test.upload_before(upload_date)
-
-
-                        if  zixun_page.status_code != 200:
-                            return False, None, f"upload_before执行失败 {zixun_page.status_code}"
-
-                        # 循环上传文件
-                        total_num = len(file_objs)
-                        for num,file_obj_main_thread in enumerate(file_objs):
-                            try:
-                                file_obj_main_thread.id
-                                file_obj = dbsession.query(File).filter_by(id=file_obj_main_thread.id).first()
-                                print(f"数据库线程得到的filename:{file_obj.filename}")
-                                #  读取文件内容
-                                file_content = file_obj.read_content()
-                                file_title = file_obj.original_filename.replace('.txt', '')
-                                
-                                
-                                # [4-5.3] 执行upload逻辑
-                                status_code,msg = test.upload(session, zixun_page, upload_date.base_url, menu_value, file_title, file_content,ifGBK)
-                                time.sleep(task.interval_seconds)
-
-                                # websocket 发送任务进度
-                                print('发送websocket进度信息到浏览器')
-                                socketio.emit('task_progress', {
-                                    'task_id': task.id,
-                                    'user_id': task.user_id,
-                                    'target_url': root_url,
-
-                                    'file_name': file_obj.original_filename,
-                                    'executed_count': num + 1,
-                                    'total_count': total_num,
-                                    'menu_text': menu_text,
-
-                                    'timestamp': datetime.now().strftime('%m-%d %H:%M:%S')
-                                }, namespace='/ws')
-
-                            except Exception as e:
-                                # f"执行错误: {str(e)}" 是在 upload_to_target 函数内部，这个函数作为线程目标函数运行。线程的返回值不会被主线程捕获或处理。
-                                print(f"执行错误: {str(e)}")
-                                return False, None, f"执行错误: {str(e)}"
-
-                                
-                            if status_code == 200:
-                                try:
-                                    # 标记文件为已执行
-                                    file_obj.is_executed = True
-                                    file_obj.is_executing = False  # 重置正在处理状态
-                                    file_obj.executed_at = datetime.utcnow()
-                                    
-                                    # 移动文件到已执行文件夹
-                                    file_obj.move_to_executed_folder()
-                                    
-                                    # 增加已执行计数
-                                    # task.executed_files_count += 1
-                                    task.updated_at = datetime.utcnow()
-                                    
-                                    # 创建执行记录
-                                    execution_record = TaskExecution(
-                                        task_id=task.id,
-                                        file_id=file_obj.id,
-                                        status='200success',
-                                        response_data=status_code,
-                                        execute_url= root_url,
-                                        url_menu_value=menu_value,
-                                        url_menu_text=menu_text,
-                                        error_message= msg
-                                    )
-                                    dbsession.add(execution_record)
-                                    
-                                    # 一次性提交所有更改，在 Flask-SQLAlchemy 中，所有通过 Model.query 查询得到的对象都会被当前的 db.session 自动跟踪。当你修改这些对象的属性时，session 会将这些对象标记为 "dirty"（需要更新）。调用 commit() 时，session 会生成相应的 SQL 语句来更新所有被修改的对象
-                                    dbsession.commit()
-                                    
-                                    logger.info(f"文件 {file_obj.original_filename} 上传到 {root_url} 成功")
-
-                                except Exception as e:
-                                    print(f"数据库操作失败: {str(e)}，回滚")
-                                    db.session.rollback()
-                                    logger.error(f"数据库操作失败: {str(e)}")
-                            else:
-                                # 记录失败执行
-
-                                execution_record = TaskExecution(
-                                    task_id=task.id,
-                                    file_id=file_obj.id,
-                                    status='fails',
-                                    response_data=status_code,
-                                    execute_url=root_url,
-                                    url_menu_value=menu_value,
-                                    url_menu_text=menu_text,
-                                    error_message=msg
-                                )
-                                dbsession.add(execution_record)
-                                dbsession.commit()
-
-                                logger.error(f"文件 {file_obj.original_filename} 上传到 {root_url} 失败: {status_code}")
-                        test.refresh_all(upload_date)
+        # 按令牌桶计算每个流程的启动延迟，分散登录请求，提交本身不等待
+        start_delays = self.start_ramp.schedule(target_urls)
 
-                
-                except Exception as e:
-                    logger.error(f"上传文件到 {target_url} 时发生错误: {str(e)}")
-                    return False, None, str(e)
-                finally:
-                    dbsession.close()
-        
-        # 使用线程池而不是创建无限线程
-        # Flask-SQLAlchemy 自动应用：根据 Flask-SQLAlchemy 的官方文档，当您在配置类中定义了 SQLALCHEMY_ENGINE_OPTIONS 时，Flask-SQLAlchemy 会自动将这些参数传递给 sqlalchemy.create_engine() 函数。
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            
-            for target_url in target_urls:
-                # 按比例分配文件
-                files_per_target = len(files) // len(target_urls)
-                start_idx = target_urls.index(target_url) * files_per_target
-                end_idx = start_idx + files_per_target
-                target_files = files[start_idx:end_idx]
-                
-                # 提交任务到线程池
-                future = executor.submit(upload_to_target, target_url, target_files)
-                futures.append(future)
-                time.sleep(0.3)
-            # 等待所有任务完成
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                except Exception as e:
-                    logger.error(f"上传任务失败: {str(e)}")
-    
-    def get_site_lock(self, root_url):
+        if self.app.config.get('UPLOAD_ENGINE', 'thread') == 'asyncio':
+            # 所有网站的上传流程作为协程运行在同一个事件循环中，提交后即返回，
+            # 结束时由回调记录错误并释放未上传的文件
+            future = self.async_engine.run_task(task_info, distributor, start_delays)
+            future.add_done_callback(lambda done: self.async_uploads_done(task_info, distributor, done))
+            return future
+
+        # 每个网站的上传流程交给节奏控制器：步骤在共享的工作线程池中执行，
+        # 文件之间的间隔由延时队列完成，不占用线程；这里提交后即返回，不再等待全部上传结束
+        for index, start_delay in enumerate(start_delays):
+            SitePipeline(self.upload_pacer, task_info, distributor, index).start(start_delay)
+
+    def async_uploads_done(self, task_info, distributor, future):
         """
-        [4-4] 获取网站锁
-        确保同一网站的请求串行执行
+        [4-3.1] asyncio引擎一次任务执行结束时的回调（在事件循环线程中调用）
+        执行异常中止或被取消时记录错误，并把分配器中尚未取出的文件释放回文件池；
+        数据库操作交给引擎的数据库线程池，不阻塞事件循环
         """
-        with session_lock:
-            if root_url not in session_locks:
-                session_locks[root_url] = threading.Lock()
-            return session_locks[root_url]
-    
+        if future.cancelled():
+            error = '已取消'
+        else:
+            error = future.exception()
+        if error is None:
+            return
+
+        logger.error(f"任务 (ID: {task_info['id']}) 上传失败: {str(error)}")
+        leftover = distributor.drain()
+        if not leftover:
+            return
+        try:
+            self.async_engine.db_executor.submit(self.in_app_context, self.release_file_ids, leftover)
+            logger.info(f"任务 (ID: {task_info['id']}) 释放了 {len(leftover)} 个未上传的文件")
+        except RuntimeError as e:
+            # 引擎已停止，重启时由 start_all_running_tasks 复位
+            logger.error(f"释放未上传的文件失败: {str(e)}")
+
+    def in_app_context(self, func, *args):
+        """
+        [4-5.0] 在独立的应用上下文中执行数据库操作
+        每次调用结束时释放数据库会话，不会在网络请求和间隔等待期间占用连接
+        """
+        # 想象Flask应用上下文就像一个"工作环境"，在这个环境里你才能：
+        # 连接数据库、使用Flask的ORM功能、访问应用配置
+        # 所以 with self.app.app_context(): 就是在子线程中"搭建"这个工作环境，让数据库操作能够正常进行
+        with self.app.app_context():
+            return func(*args)
+
+    def prepare_upload_target(self, target_url):
+        """
+        [4-5.1] 解析目标URL并加载网站配置
+        URL格式为 <root_url>栏目值:<menu_value>，格式错误或未配置时抛出ValueError
+        """
+        url_parts = target_url.split('栏目值:')
+        if len(url_parts) != 2:
+            raise ValueError(f"URL格式错误: {target_url}")
 
+        root_url = url_parts[0]
+        menu_value = url_parts[1]
+        # 从网站目录缓存获取网站配置和栏目文本
+        site = site_directory.get_site(root_url)
+        if not site:
+            raise ValueError(f"未找到URL配置: {root_url}")
 
+        return {
+            'target_url': target_url,
+            'root_url': root_url,
+            'menu_value': menu_value,
+            'menu_text': site.menus.get(menu_value),
+            # 创建session上下文，session由登录会话池提供
+            'upload_date': url_update_context(None, site.root_url, site.suffix,
+                                              site.username, site.password)
+        }
+
+    def login_site(self, target):
+        """
+        [4-5.2] 确保网站已登录
+        执行upload_before逻辑（复用已登录的会话，必要时才登录），失败时抛出异常
+        """
+        zixun_page, ifGBK = test.upload_before(target['upload_date'])
+        if zixun_page.status_code != 200:
+            raise Exception(f"upload_before执行失败 {zixun_page.status_code}")
+
+    def load_upload_file(self, file_id):
+        """
+        [4-5.3] 读取待上传的文件
+        返回普通字典，不把ORM对象带出数据库会话；文件记录已被删除时返回None。
+        文件缺失、编码错误等读取失败不抛出异常，content 为None、read_error 为错误信息，
+        由调用方记录失败后继续下一个文件；数据库错误照常抛出
+        """
+        file_obj = File.query.get(file_id)
+        if not file_obj:
+            logger.warning(f"文件记录不存在，跳过: {file_id}")
+            return None
+
+        print(f"数据库线程得到的filename:{file_obj.filename}")
+        file_data = {
+            'id': file_obj.id,
+            'filename': file_obj.filename,
+            'file_path': file_obj.file_path,
+            'original_filename': file_obj.original_filename,
+            'title': file_obj.original_filename.replace('.txt', ''),
+            'content': None,
+            'read_error': None
+        }
+        try:
+            #  读取文件内容
+            file_data['content'] = file_obj.read_content()
+        except Exception as e:
+            file_data['read_error'] = str(e)
+        return file_data
+
+    def upload_file_to_site(self, target, file_data):
+        """
+        [4-5.4] 上传一个文件到网站
+        只发HTTP请求，不访问数据库；登录失效时重新登录后重试一次
+        """
+        upload_date = target['upload_date']
+        for _ in range(2):
+            zixun_page, ifGBK = test.upload_before(upload_date)
+            status_code, msg = test.upload(upload_date.session, zixun_page, upload_date.base_url,
+                                           target['menu_value'], file_data['title'], file_data['content'], ifGBK)
+            if msg != test.LOGIN_EXPIRED_MSG:
+                break
+        return status_code, msg
+
+    def record_upload_result(self, task_info, target, file_data, status_code, msg):
+        """
+        [4-5.5] 记录上传结果
+        成功时把文件移动到已执行文件夹；文件状态和执行记录交给 ExecutionRecorder 批量写入
+        """
+        now = datetime.utcnow()
+        file_update = None
+        if status_code == 200:
+            status = ExecutionStatus.SUCCESS
+            file_path = file_data['file_path']
+            try:
+                # 移动文件到已执行文件夹（只操作磁盘，数据库路径随执行记录一起批量更新）
+                file_path = File.move_path_to_executed_folder(file_path, file_data['filename']) or file_path
+            except Exception as e:
+                logger.error(str(e))
+            # 标记文件为已执行，并重置正在处理状态
+            file_update = {'id': file_data['id'], 'file_path': file_path, 'executed_at': now}
+            logger.info(f"文件 {file_data['original_filename']} 上传到 {target['root_url']} 成功")
+        else:
+            status = ExecutionStatus.FAILED
+            logger.error(f"文件 {file_data['original_filename']} 上传到 {target['root_url']} 失败: {status_code}")
+
+        # 创建执行记录
+        self.execution_recorder.record({
+            'task_id': task_info['id'],
+            'file_id': file_data['id'],
+            'execution_time': now,
+            'status': status,
+            'response_data': str(status_code),
+            'execute_url': target['root_url'],
+            'url_menu_value': target['menu_value'],
+            'url_menu_text': target['menu_text'],
+            'error_message': msg
+        }, file_update)
+
+    def record_read_failure(self, task_info, target, file_data):
+        """
+        [4-5.5.1] 记录读取失败的文件
+        文件本身的问题重试也不会成功：记一条失败的执行记录，文件保持“正在执行”标记不放回文件池，
+        之后的执行不会再先领到它（重启时复位，修复文件后即可重新上传）
+        """
+        logger.error(f"读取文件 {file_data['original_filename']} 失败，跳过: {file_data['read_error']}")
+        self.record_upload_result(task_info, target, file_data, None, file_data['read_error'])
+
+    def emit_upload_progress(self, task_info, target, file_name, executed_count, total_count):
+        """
+        [4-5.6] websocket 发送任务进度
+        推送失败只记录日志，不影响上传流程
+        """
+        print('发送websocket进度信息到浏览器')
+        try:
+            socketio.emit('task_progress', {
+                'task_id': task_info['id'],
+                'user_id': task_info['user_id'],
+                'target_url': target['root_url'],
+                'file_name': file_name,
+                'executed_count': executed_count,
+                'total_count': total_count,
+                'menu_text': target['menu_text'],
+                'timestamp': datetime.now().strftime('%m-%d %H:%M:%S')
+            }, namespace='/ws')
+        except Exception as e:
+            logger.error(f"推送任务进度失败: {str(e)}")
+
+    def refresh_site(self, target):
+        """
+        [4-5.7] 刷新网站首页、栏目页和内容页
+        """
+        test.refresh_all(target['upload_date'])
+    
     def start_all_running_tasks(self):
         """
         [4-8] 启动所有运行中的任务
-        系统重启时调用，恢复之前运行的任务
+        系统重启时调用，恢复之前运行的任务。
+        只允许一个实例连接同一个数据库运行调度器：任务定时、文件分配、网站排队都只在本进程内存中，
+        启动时会把所有“正在执行”的文件当作上次进程遗留的领取并复位，
+        如果另一个实例正在上传，它领取的文件会被再次领取、重复上传
         """
         with self.app.app_context():
+            # 进程重启后内存中的领取队列已丢失，复位遗留的“正在执行”标记（单实例前提）
+            reset_count = File.query.filter_by(is_executed=False, is_executing=True)\
+                                    .update({'is_executing': False}, synchronize_session=False)
+            db.session.commit()
+            if reset_count:
+                logger.info(f"复位了 {reset_count} 个上次运行遗留的“正在执行”文件")
+
             running_tasks = Task.query.filter_by(status='running').all()
             
             for task in running_tasks:
@@ -522,6 +580,9 @@ class TaskScheduler:
         """
         return {
             'running': self.scheduler.running,
+            'upload_pacer': self.upload_pacer.stats(),
+            'start_ramp': self.start_ramp.stats(),
+            'execution_recorder': self.execution_recorder.stats(),
             'jobs_count': len(self.scheduler.get_jobs()),
             'jobs': [
                 {
@@ -0,0 +1,113 @@
+"""
+[4-13] 上传流程启动节奏
+代替每提交一个目标就 time.sleep(0.3) 的固定串行延迟：
+用令牌桶为每个流程计算启动延迟（全局一个桶限制本机出口的总登录速率，每个域名一个桶），
+流程交给延时队列在对应时间启动，提交本身不等待
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    [4-13.1] 令牌桶（按理论到达时间实现，可以预约未来的令牌）
+    rate 为每秒补充的令牌数，burst 为桶容量
+    """
+
+    def __init__(self, rate, burst):
+        self.interval = 1.0 / rate
+        self.tolerance = (max(burst, 1) - 1) * self.interval
+        self.theoretical_arrival = 0.0
+
+    def earliest(self, now):
+        """最早可以取到令牌的时间"""
+        return max(now, self.theoretical_arrival - self.tolerance)
+
+    def consume(self, at):
+        """在at时刻取走一个令牌"""
+        self.theoretical_arrival = max(self.theoretical_arrival, at) + self.interval
+
+
+class StartRamp:
+    """
+    [4-13.2] 启动节奏控制
+    每个流程需要同时从全局桶和所在域名的桶各取一个令牌，
+    取不到时按令牌补充速度往后排，得到相对现在的启动延迟（秒）
+    """
+
+    def __init__(self, task_scheduler):
+        """
+        [4-13.2.1] 初始化，速率配置在首次使用时读取
+        """
+        self.task_scheduler = task_scheduler
+        self.global_bucket = None
+        self.host_buckets = {}
+        self.lock = threading.Lock()
+        # 最近一次任务执行的启动耗时（第一个流程到最后一个流程的启动间隔）
+        self.last_ramp_up_seconds = 0.0
+        self.max_ramp_up_seconds = 0.0
+        self.ramp_count = 0
+        self.scheduled_until = 0.0
+
+    def _configure(self):
+        config = self.task_scheduler.app.config
+        self.global_rate = float(config.get('UPLOAD_START_RATE', 5))
+        self.global_burst = int(config.get('UPLOAD_START_BURST', 10))
+        self.host_rate = float(config.get('UPLOAD_HOST_START_RATE', 1))
+        self.host_burst = int(config.get('UPLOAD_HOST_START_BURST', 1))
+        self.global_bucket = TokenBucket(self.global_rate, self.global_burst)
+
+    @staticmethod
+    def host_of(target_url):
+        """目标URL（<root_url>栏目值:<menu_value>）对应的域名"""
+        root_url = target_url.split('栏目值:')[0]
+        return urlparse(root_url).netloc.lower() or root_url
+
+    def schedule(self, target_urls):
+        """
+        [4-13.2.2] 为一批目标计算启动延迟
+        返回与 target_urls 一一对应的延迟秒数
+        """
+        with self.lock:
+            if self.global_bucket is None:
+                self._configure()
+
+            now = time.monotonic()
+            delays = []
+            for target_url in target_urls:
+                host = self.host_of(target_url)
+                host_bucket = self.host_buckets.get(host)
+                if host_bucket is None:
+                    host_bucket = self.host_buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+
+                start_at = max(self.global_bucket.earliest(now), host_bucket.earliest(now))
+                self.global_bucket.consume(start_at)
+                host_bucket.consume(start_at)
+                delays.append(start_at - now)
+
+            if delays:
+                self.last_ramp_up_seconds = max(delays) - min(delays)
+                self.max_ramp_up_seconds = max(self.max_ramp_up_seconds, self.last_ramp_up_seconds)
+                self.ramp_count += 1
+                self.scheduled_until = max(self.scheduled_until, now + max(delays))
+            return delays
+
+    def stats(self):
+        """
+        [4-13.2.3] 启动节奏指标
+        """
+        with self.lock:
+            configured = self.global_bucket is not None
+            return {
+                'global_rate': self.global_rate if configured else None,
+                'global_burst': self.global_burst if configured else None,
+                'host_rate': self.host_rate if configured else None,
+                'host_burst': self.host_burst if configured else None,
+                'last_ramp_up_seconds': round(self.last_ramp_up_seconds, 3),
+                'max_ramp_up_seconds': round(self.max_ramp_up_seconds, 3),
+                'ramp_count': self.ramp_count,
+                # 已预约但还没到启动时间的剩余秒数
+                'pending_ramp_seconds': round(max(self.scheduled_until - time.monotonic(), 0), 3),
+                'hosts': len(self.host_buckets)
+            }
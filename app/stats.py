@@ -0,0 +1,262 @@
+"""
+[6] 统计服务
+管理后台用到的文件、任务、执行统计，按整页用户用固定数量的分组查询计算，
+结果放在短时间的内存缓存中，多个管理员反复刷新页面时不再重复查询MySQL
+"""
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, case
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    [6-1] 带过期时间的内存缓存
+    同一个键同时只有一个线程执行加载，其他线程等待它的结果；
+    加载锁按键的哈希分到固定数量的锁上，不随键的数量增长
+    """
+
+    LOAD_LOCK_COUNT = 64
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load_locks = [threading.RLock() for _ in range(self.LOAD_LOCK_COUNT)]
+
+    def get_or_load(self, key, loader, ttl):
+        """
+        [6-1.1] 获取缓存，不存在或已过期时调用loader加载
+        """
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        with self.load_locks[hash(key) % self.LOAD_LOCK_COUNT]:
+            # 等待期间可能已被其他线程加载
+            value = self._get(key)
+            if value is not None:
+                return value
+
+            value = loader()
+            now = time.monotonic()
+            with self.lock:
+                # 顺便清掉已过期的键（如不再访问的用户列表分页），缓存不会无限增长
+                for expired_key in [k for k, (_, expires_at) in self.entries.items() if now >= expires_at]:
+                    del self.entries[expired_key]
+                self.entries[key] = (value, now + ttl)
+            return value
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            return value
+
+    def update(self, key, func):
+        """
+        [6-1.2] 用 func(旧值) 的结果替换未过期的缓存，缓存不存在时不做任何事
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            value, expires_at = entry
+            self.entries[key] = (func(value), expires_at)
+
+    def invalidate(self, prefix=None):
+        """
+        [6-1.3] 使缓存失效
+        prefix 为None时清空全部，否则删除键的第一项等于prefix的缓存
+        """
+        with self.lock:
+            if prefix is None:
+                self.entries.clear()
+                return
+            for key in [key for key in self.entries if key[0] == prefix]:
+                del self.entries[key]
+
+
+# 任务状态取值
+TASK_STATUSES = ('pending', 'running', 'paused', 'completed', 'failed')
+
+
+class StatsService:
+    """
+    [6-2] 统计服务
+    """
+
+    def __init__(self):
+        self.cache = TTLCache()
+
+    @staticmethod
+    def cache_ttl():
+        return current_app.config.get('ADMIN_STATS_CACHE_TTL', 10)
+
+    def get_users_stats(self, user_ids):
+        """
+        [6-2.1] 获取一页用户的文件、任务、执行统计
+        不管每页多少用户，都只执行三条分组查询；返回 {user_id: 统计字典}
+        """
+        user_ids = tuple(sorted(set(user_ids)))
+        return self.cache.get_or_load(('users', user_ids),
+                                      lambda: self._load_users_stats(user_ids),
+                                      self.cache_ttl())
+
+    def _load_users_stats(self, user_ids):
+        from app.models.file import File
+        from app.models.task import Task
+        from app.models.task_execution import TaskExecution
+
+        if not user_ids:
+            return {}
+
+        # [6-2.1.1] 文件统计：总数、已执行数
+        file_rows = db.session.query(
+            File.user_id,
+            func.count(File.id).label('total_files'),
+            func.sum(case((File.is_executed == True, 1), else_=0)).label('executed_files')
+        ).filter(File.user_id.in_(user_ids))\
+         .group_by(File.user_id)\
+         .all()
+        file_counts = {row.user_id: row for row in file_rows}
+
+        # [6-2.1.2] 任务统计：按用户和状态分组
+        task_rows = db.session.query(Task.user_id, Task.status, func.count(Task.id).label('count'))\
+                              .filter(Task.user_id.in_(user_ids))\
+                              .group_by(Task.user_id, Task.status)\
+                              .all()
+        task_counts = {}
+        for row in task_rows:
+            task_counts.setdefault(row.user_id, {})[row.status] = row.count
+
+        # [6-2.1.3] 执行统计
+        execution_stats = TaskExecution.get_users_execution_stats(user_ids)
+
+        stats = {}
+        for user_id in user_ids:
+            file_row = file_counts.get(user_id)
+            total_files = file_row.total_files if file_row else 0
+            executed_files = int(file_row.executed_files or 0) if file_row else 0
+            status_counts = task_counts.get(user_id, {})
+
+            stats[user_id] = {
+                # 与 User.get_upload_stats 相同的字段
+                'total_files': total_files,
+                'executed_files': executed_files,
+                'pending_files': total_files - executed_files,
+                # 与 User.get_task_stats 相同的字段
+                'total_tasks': sum(status_counts.values()),
+                'running_tasks': status_counts.get('running', 0),
+                'completed_tasks': status_counts.get('completed', 0),
+                'failed_tasks': status_counts.get('failed', 0),
+                **execution_stats[user_id]
+            }
+        return stats
+
+    def get_table_counts(self):
+        """
+        [6-2.2] 系统状态页面的数据库统计（用户、任务、文件、执行记录数）
+        """
+        return self.cache.get_or_load(('table_counts',), self._load_table_counts, self.cache_ttl())
+
+    @staticmethod
+    def _load_table_counts():
+        from app.models.user import User
+        from app.models.file import File
+        from app.models.task import Task
+        from app.models.task_execution import TaskExecutionDaily
+
+        return {
+            'users_count': User.query.count(),
+            'tasks_count': Task.query.count(),
+            'files_count': File.query.count(),
+            'executions_count': TaskExecutionDaily.total_count()
+        }
+
+    def get_task_status_counts(self):
+        """
+        [6-2.3] 各状态的任务数量，一次分组查询
+        返回 {'all': 总数, 'pending': n, 'running': n, ...}
+        """
+        return self.cache.get_or_load(('task_status',), self._load_task_status_counts, self.cache_ttl())
+
+    @staticmethod
+    def _load_task_status_counts():
+        from app.models.task import Task
+
+        rows = db.session.query(Task.status, func.count(Task.id).label('count'))\
+                         .group_by(Task.status).all()
+        counts = {status: 0 for status in TASK_STATUSES}
+        for row in rows:
+            counts[row.status] = row.count
+        counts['all'] = sum(row.count for row in rows)
+        return counts
+
+    def get_dashboard_counts(self):
+        """
+        [6-2.4] 管理面板的用户数、文件数、已执行文件数
+        """
+        return self.cache.get_or_load(('dashboard',), self._load_dashboard_counts, self.cache_ttl())
+
+    @staticmethod
+    def _load_dashboard_counts():
+        from app.models.user import User
+        from app.models.file import File
+
+        file_row = db.session.query(
+            func.count(File.id).label('total_files'),
+            func.sum(case((File.is_executed == True, 1), else_=0)).label('executed_files')
+        ).one()
+        total_files = file_row.total_files
+        executed_files = int(file_row.executed_files or 0)
+        return {
+            'total_users': User.query.count(),
+            'total_files': total_files,
+            'executed_files': executed_files,
+            'pending_files': total_files - executed_files
+        }
+
+    def task_status_changed(self, old_status, new_status):
+        """
+        [6-2.5] 任务状态迁移后调用（Task.start_task / pause_task / complete_task / fail_task）
+        直接调整缓存中的状态计数，不重新查询；按用户的任务统计缓存失效
+        """
+        if old_status != new_status:
+            def apply(counts):
+                counts = dict(counts)
+                if old_status in counts:
+                    counts[old_status] = max(counts[old_status] - 1, 0)
+                counts[new_status] = counts.get(new_status, 0) + 1
+                return counts
+
+            self.cache.update(('task_status',), apply)
+        self.cache.invalidate('users')
+
+    def tasks_changed(self):
+        """
+        [6-2.6] 新建或删除任务后调用，任务相关的缓存失效
+        """
+        self.cache.invalidate('task_status')
+        self.cache.invalidate('users')
+        self.cache.invalidate('table_counts')
+
+    def invalidate(self, prefix=None):
+        """
+        [6-2.7] 使统计缓存失效
+        """
+        self.cache.invalidate(prefix)
+
+
+# [6-3] 全局统计服务实例
+stats_service = StatsService()
@@ -0,0 +1,158 @@
+"""
+[7] 系统状态采样
+后台线程每隔几秒采集一次CPU、内存、磁盘、线程数、数据库连接池和调度队列状态，
+保存在环形缓冲区中；系统状态页面和接口直接读取最近一次采样，不在请求中阻塞等待
+"""
+import logging
+import os
+import platform
+import threading
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMonitor:
+    """
+    [7-1] 系统状态采样器
+    """
+
+    def __init__(self):
+        self.app = None
+        self.samples = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.interval = 5
+        self.process = None
+
+    def init_app(self, app):
+        """
+        [7-1.1] 根据配置初始化并启动采样线程
+        """
+        self.app = app
+        self.interval = app.config.get('SYSTEM_MONITOR_INTERVAL', 5)
+        with self.lock:
+            self.samples = deque(self.samples, maxlen=app.config.get('SYSTEM_MONITOR_HISTORY', 120))
+        self.start()
+
+    def start(self):
+        """
+        [7-1.2] 启动采样线程
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        try:
+            import psutil
+            self.process = psutil.Process(os.getpid())
+            # 第一次调用只建立基准，之后的 cpu_percent(interval=None) 返回两次调用之间的平均值
+            psutil.cpu_percent(interval=None)
+        except ImportError:
+            logger.warning("未安装psutil，系统状态中的CPU、内存、磁盘信息不可用")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='system-monitor', daemon=True)
+        self.thread.start()
+
+        import atexit
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        [7-1.3] 停止采样线程
+        """
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                sample = self.collect()
+                with self.lock:
+                    self.samples.append(sample)
+            except Exception as e:
+                logger.error(f"系统状态采样失败: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def collect(self):
+        """
+        [7-1.4] 采集一次系统状态
+        """
+        sample = {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'cpu_percent': None,
+            'memory_percent': None,
+            'disk_usage': None,
+            'process_threads': None,
+            'process_memory_mb': None,
+            'python_threads': threading.active_count(),
+            'python_version': platform.python_version(),
+            'process_id': os.getpid()
+        }
+
+        # [7-1.4.1] CPU、内存、磁盘
+        if self.process is not None:
+            import psutil
+            sample['cpu_percent'] = psutil.cpu_percent(interval=None)
+            sample['memory_percent'] = psutil.virtual_memory().percent
+            sample['disk_usage'] = psutil.disk_usage('/').percent
+            sample['process_threads'] = self.process.num_threads()
+            sample['process_memory_mb'] = round(self.process.memory_info().rss / 1024 / 1024, 1)
+
+        # [7-1.4.2] 数据库连接池
+        sample['db_pool'] = self.collect_db_pool()
+
+        # [7-1.4.3] 调度器和上传队列
+        sample['scheduler'] = self.collect_scheduler()
+        return sample
+
+    def collect_db_pool(self):
+        from app import db
+
+        with self.app.app_context():
+            pool = db.engine.pool
+        stats = {}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            stats[name] = method() if callable(method) else None
+        return stats
+
+    @staticmethod
+    def collect_scheduler():
+        from app.scheduler import task_scheduler
+
+        pacer_stats = task_scheduler.upload_pacer.stats()
+        return {
+            'running': task_scheduler.scheduler.running,
+            'jobs_count': len(task_scheduler.scheduler.get_jobs()),
+            'scheduled_steps': pacer_stats['scheduled_steps'],
+            'active_sites': pacer_stats['active_sites'],
+            'waiting_pipelines': pacer_stats['waiting_pipelines'],
+            'buffered_executions': task_scheduler.execution_recorder.stats()['buffered']
+        }
+
+    def latest(self):
+        """
+        [7-1.5] 最近一次采样，还没有采样时立即采集一次
+        """
+        with self.lock:
+            if self.samples:
+                return self.samples[-1]
+
+        sample = self.collect()
+        with self.lock:
+            self.samples.append(sample)
+        return sample
+
+    def history(self, limit=None):
+        """
+        [7-1.6] 最近的采样记录（按时间顺序），用于绘制趋势图
+        """
+        with self.lock:
+            samples = list(self.samples)
+        return samples[-limit:] if limit else samples
+
+
+# [7-2] 全局采样器实例
+system_monitor = SystemMonitor()
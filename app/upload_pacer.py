@@ -0,0 +1,289 @@
+"""
+[4-11] 上传节奏控制
+用调度器级别的延时队列代替上传线程中的 time.sleep(interval_seconds)：
+每个网站的上传流程拆成若干步骤，一步完成后把下一步按间隔时间放回延时队列，
+工作线程只在真正发送HTTP请求、读写数据库时占用，一个小线程池即可服务大量网站
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class UploadPacer:
+    """
+    [4-11.1] 延时队列 + 工作线程池
+    - 定时线程维护按到期时间排序的堆，到期的步骤交给工作线程池执行
+    - 同一网站同时只有一个上传流程在运行，其余流程按提交顺序排队，
+      代替原来在整个流程期间持有的网站锁
+    """
+
+    def __init__(self, task_scheduler):
+        """
+        [4-11.1.1] 初始化，定时线程和线程池在首次使用时才启动
+        """
+        self.task_scheduler = task_scheduler
+        self.executor = None
+        self.timer_thread = None
+        self.heap = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        # 正在运行上传流程的网站，以及排队等待的流程 {root_url: deque([SitePipeline, ...])}
+        self.active_sites = set()
+        self.waiting_pipelines = {}
+        self.sites_lock = threading.Lock()
+
+    def start(self):
+        """
+        [4-11.1.2] 启动工作线程池和定时线程
+        """
+        with self.condition:
+            if self.running:
+                return
+
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.task_scheduler.app.config.get('MAX_WORKERS', 20),
+                thread_name_prefix='upload-worker'
+            )
+            self.running = True
+            self.timer_thread = threading.Thread(target=self._run_timer, name='upload-pacer', daemon=True)
+            self.timer_thread.start()
+            logger.info("上传节奏控制器已启动")
+
+    def shutdown(self):
+        """
+        [4-11.1.3] 停止定时线程，未到期的步骤直接丢弃
+        丢弃的步骤对应的文件仍是“正在执行”状态，重启时由 start_all_running_tasks 复位
+        """
+        with self.condition:
+            if not self.running:
+                return
+            self.running = False
+            self.heap.clear()
+            self.condition.notify_all()
+        self.executor.shutdown(wait=False)
+        logger.info("上传节奏控制器已停止")
+
+    def submit(self, func, *args):
+        """
+        [4-11.1.4] 立即在工作线程中执行
+        """
+        self.call_later(0, func, *args)
+
+    def call_later(self, delay, func, *args):
+        """
+        [4-11.1.5] delay秒后在工作线程中执行
+        """
+        self.start()
+        with self.condition:
+            heapq.heappush(self.heap, (time.monotonic() + max(delay, 0), next(self.sequence), func, args))
+            self.condition.notify()
+
+    def _run_timer(self):
+        """
+        [4-11.1.6] 定时线程：等待最早到期的步骤，到期后交给线程池
+        """
+        while True:
+            with self.condition:
+                while self.running and not self.heap:
+                    self.condition.wait()
+                if not self.running:
+                    return
+
+                due_at, _, func, args = self.heap[0]
+                wait_seconds = due_at - time.monotonic()
+                if wait_seconds > 0:
+                    # 期间有更早的步骤加入时会被唤醒重新计算
+                    self.condition.wait(wait_seconds)
+                    continue
+                heapq.heappop(self.heap)
+
+            self.executor.submit(self._run_step, func, args)
+
+    @staticmethod
+    def _run_step(func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"上传步骤执行失败: {str(e)}")
+
+    def acquire_site(self, root_url, pipeline):
+        """
+        [4-11.1.7] 占用网站
+        网站空闲时返回True；否则把流程加入该网站的等待队列，返回False，
+        轮到它时由 release_site 调用 pipeline.resume()
+        """
+        with self.sites_lock:
+            if root_url not in self.active_sites:
+                self.active_sites.add(root_url)
+                return True
+            self.waiting_pipelines.setdefault(root_url, deque()).append(pipeline)
+            return False
+
+    def release_site(self, root_url):
+        """
+        [4-11.1.8] 释放网站，并启动该网站排队中的下一个流程
+        """
+        with self.sites_lock:
+            waiting = self.waiting_pipelines.get(root_url)
+            if waiting:
+                next_pipeline = waiting.popleft()
+                if not waiting:
+                    del self.waiting_pipelines[root_url]
+            else:
+                next_pipeline = None
+                self.active_sites.discard(root_url)
+
+        if next_pipeline is not None:
+            self.submit(next_pipeline.resume)
+
+    def stats(self):
+        """
+        [4-11.1.9] 状态信息
+        """
+        with self.condition:
+            scheduled_steps = len(self.heap)
+        with self.sites_lock:
+            active_sites = len(self.active_sites)
+            waiting_pipelines = sum(len(waiting) for waiting in self.waiting_pipelines.values())
+        return {
+            'running': self.running,
+            'scheduled_steps': scheduled_steps,
+            'active_sites': active_sites,
+            'waiting_pipelines': waiting_pipelines
+        }
+
+
+class SitePipeline:
+    """
+    [4-11.2] 单个网站的上传流程
+    准备 → 排队占用网站 → 登录 → (从分配器取一个文件上传 → 等待间隔) × N → 刷新 → 释放网站
+    每一步在工作线程中执行，步骤之间的间隔由延时队列完成
+    """
+
+    def __init__(self, pacer, task_info, distributor, index):
+        self.pacer = pacer
+        self.scheduler = pacer.task_scheduler
+        self.task_info = task_info
+        self.distributor = distributor
+        self.index = index
+        self.target_url = distributor.target_urls[index]
+        self.target = None
+        self.site_acquired = False
+        self.uploaded_count = 0
+        self.success_count = 0
+
+    def start(self, delay=0):
+        """
+        [4-11.2.1] 提交流程
+        """
+        self.pacer.call_later(delay, self.prepare)
+
+    def prepare(self):
+        """
+        [4-11.2.2] 解析目标URL，网站空闲时直接开始，否则排队
+        """
+        try:
+            self.target = self.scheduler.in_app_context(self.scheduler.prepare_upload_target, self.target_url)
+        except Exception as e:
+            logger.error(f"上传文件到 {self.target_url} 时发生错误: {str(e)}")
+            self.finish()
+            return
+
+        if self.pacer.acquire_site(self.target['root_url'], self):
+            self.resume()
+
+    def resume(self):
+        """
+        [4-11.2.3] 已占用网站：登录后开始上传
+        """
+        self.site_acquired = True
+        self.distributor.start(self.index)
+        try:
+            self.scheduler.login_site(self.target)
+        except Exception as e:
+            logger.error(f"上传文件到 {self.target_url} 时发生错误: {str(e)}")
+            self.finish()
+            return
+
+        self.upload_next()
+
+    def upload_next(self):
+        """
+        [4-11.2.4] 上传下一个文件，间隔 interval_seconds 后再执行下一步
+        没有文件可取或连续失败被停止时进入刷新；单个文件出错不结束流程：
+        文件读取失败记为失败并跳过，数据库或网络错误把文件放回文件池
+        """
+        file_id = self.distributor.next_file(self.index)
+        if file_id is None:
+            self.refresh()
+            return
+
+        try:
+            file_data = self.scheduler.in_app_context(self.scheduler.load_upload_file, file_id)
+        except Exception as e:
+            logger.error(f"加载文件 {file_id} 时发生错误: {str(e)}")
+            self.scheduler.in_app_context(self.scheduler.release_file_ids, [file_id])
+            self.pacer.submit(self.upload_next)
+            return
+        if file_data is None:
+            self.pacer.submit(self.upload_next)
+            return
+        if file_data['read_error']:
+            self.scheduler.record_read_failure(self.task_info, self.target, file_data)
+            self.pacer.submit(self.upload_next)
+            return
+
+        try:
+            status_code, msg = self.scheduler.upload_file_to_site(self.target, file_data)
+        except Exception as e:
+            logger.error(f"上传文件 {file_data['original_filename']} 到 {self.target['root_url']} "
+                         f"时发生错误: {str(e)}")
+            # 请求出错可能只是暂时的，文件放回文件池；计入连续失败，达到上限时停止该目标
+            self.scheduler.in_app_context(self.scheduler.release_file_ids, [file_id])
+            self.distributor.report(self.index, False)
+            self.pacer.call_later(self.task_info['interval_seconds'], self.upload_next)
+            return
+
+        self.uploaded_count += 1
+        self.scheduler.emit_upload_progress(self.task_info, self.target, file_data['original_filename'],
+                                            self.uploaded_count,
+                                            self.uploaded_count + self.distributor.remaining(self.index))
+        self.scheduler.record_upload_result(self.task_info, self.target, file_data, status_code, msg)
+
+        if status_code == 200:
+            self.success_count += 1
+        self.distributor.report(self.index, status_code == 200)
+        self.pacer.call_later(self.task_info['interval_seconds'], self.upload_next)
+
+    def refresh(self):
+        """
+        [4-11.2.5] 有上传成功的文件时刷新网站，然后结束
+        """
+        try:
+            if self.success_count:
+                self.scheduler.refresh_site(self.target)
+        except Exception as e:
+            logger.error(f"刷新网站 {self.target['root_url']} 时发生错误: {str(e)}")
+        finally:
+            self.finish()
+
+    def finish(self):
+        """
+        [4-11.2.6] 结束流程
+        最后一个结束的流程把未上传的文件释放回文件池；释放网站，排队中的下一个流程开始执行
+        """
+        leftover = self.distributor.finish(self.index)
+        if leftover:
+            self.scheduler.in_app_context(self.scheduler.release_file_ids, leftover)
+            logger.info(f"任务 (ID: {self.task_info['id']}) 释放了 {len(leftover)} 个未上传的文件")
+
+        if self.site_acquired:
+            self.site_acquired = False
+            self.pacer.release_site(self.target['root_url'])
@@ -0,0 +1,314 @@
+"""
+[10] Excel批量导入网站
+上传的Excel按列整体清洗、校验、去重（pandas向量化操作，不逐行处理），
+合格的网站交给后台任务：并发登录各网站获取栏目（同一域名同时只探测少量网站，每个请求有超时），
+结果分批写入 batch_url_find，进度通过 /ws 命名空间的 Socket.IO 推送到浏览器；
+页面请求只负责解析文件并启动任务，不再等待所有网站探测完成
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+from app import db, socketio
+
+logger = logging.getLogger(__name__)
+
+# Excel前五列依次对应的字段
+IMPORT_COLUMNS = ('name', 'root_url', 'suffix', 'username', 'password')
+
+# 必填字段
+REQUIRED_COLUMNS = ('root_url', 'suffix', 'username', 'password')
+
+
+def read_import_sheet(file, filename):
+    """
+    [10-0.1] 读取Excel第一个工作表的前五列，第一行为表头
+    .xlsx 用 openpyxl 只读模式逐行读取，不加载整个工作簿的对象模型；.xls 仍由pandas读取
+    列数不足时抛出ValueError
+    """
+    import pandas as pd
+
+    if not filename.lower().endswith('.xlsx'):
+        df = pd.read_excel(file)
+        if len(df.columns) < len(IMPORT_COLUMNS):
+            raise ValueError('Excel文件格式错误：需要至少5列数据')
+        df = df.iloc[:, :len(IMPORT_COLUMNS)]
+        df.columns = IMPORT_COLUMNS
+        return df
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        row_iter = sheet.iter_rows(values_only=True)
+        header = next(row_iter, ())
+        if len(header) < len(IMPORT_COLUMNS):
+            raise ValueError('Excel文件格式错误：需要至少5列数据')
+
+        columns = {column: [] for column in IMPORT_COLUMNS}
+        for values in row_iter:
+            values = tuple(values[:len(IMPORT_COLUMNS)]) + (None,) * (len(IMPORT_COLUMNS) - len(values))
+            for column, value in zip(IMPORT_COLUMNS, values):
+                columns[column].append(value)
+    finally:
+        workbook.close()
+
+    return pd.DataFrame(columns, dtype=object)
+
+
+def parse_import_rows(df):
+    """
+    [10-0.2] 清洗和校验导入数据，按列整体处理
+    去掉全空行；各字段去除首尾空白；name为空时命名为 未命名_行号；
+    缺少必填字段、与文件中前面的行 (root_url, suffix) 重复的行直接判定为错误
+    返回 (待探测的行, 已判定错误的行)，均为dict列表
+    """
+    df = df.dropna(how='all')
+    if df.empty:
+        return [], []
+
+    # 空单元格为空字符串，其余转为去除首尾空白的字符串
+    cleaned = df.apply(lambda column: column.where(column.notna(), '').astype(str).str.strip())
+    default_names = '未命名_' + (df.index.to_series() + 1).astype(str)
+    cleaned['name'] = cleaned['name'].where(df['name'].notna(), default_names)
+
+    missing = (cleaned[list(REQUIRED_COLUMNS)] == '').any(axis=1)
+    # 只在字段完整的行之间判断重复，缺少字段的行不会让后面完整的同名行被判为重复
+    duplicated = cleaned[~missing].duplicated(subset=['root_url', 'suffix'], keep='first')\
+        .reindex(cleaned.index, fill_value=False)
+
+    cleaned['status'] = 'error'
+    cleaned['error_message'] = None
+    cleaned.loc[missing, 'error_message'] = '缺少必要字段'
+    cleaned.loc[duplicated, 'error_message'] = '文件中重复'
+
+    valid = ~(missing | duplicated)
+    rows = cleaned.loc[valid, list(IMPORT_COLUMNS)].to_dict('records')
+    invalid_rows = cleaned.loc[~valid].to_dict('records')
+    return rows, invalid_rows
+
+
+class TimeoutSession(requests.Session):
+    """
+    [10-1] 所有请求默认带超时的 requests.Session
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def probe_site(row, timeout):
+    """
+    [10-2] 登录一个网站并获取栏目
+    使用一次性的带超时会话，不放入上传用的登录会话池；返回 (状态, 错误信息, 栏目列表)
+    """
+    import test
+    from app.models.url_context import url_update_context
+
+    session = TimeoutSession(timeout)
+    upload_context = url_update_context(session, row['root_url'], row['suffix'],
+                                        row['username'], row['password'])
+    try:
+        result = test.login_diguo(upload_context)
+        if not result:
+            return 'error', '获取菜单失败: 登录失败', []
+        zixun_page, zixun_page_url, _ = result
+        menu_data = test.get_js_fr_zixun_page(session, zixun_page, zixun_page_url)
+    except requests.Timeout:
+        return 'error', f'获取菜单失败: 请求超时（{timeout}秒）', []
+    except Exception as e:
+        return 'error', f'获取菜单失败: {str(e)}', []
+    finally:
+        session.close()
+
+    if menu_data:
+        return 'success', None, menu_data
+    return 'no_menu', '未获取到菜单数据', []
+
+
+class UrlImportJob:
+    """
+    [10-3] 一次Excel导入任务
+    rows 为待探测的网站（dict: name, root_url, suffix, username, password），
+    invalid_rows 为解析阶段就已确定结果的行（dict 另含 status、error_message），直接保存
+    """
+
+    def __init__(self, manager, user_id, rows, invalid_rows):
+        self.manager = manager
+        self.app = manager.app
+        self.user_id = user_id
+        self.rows = rows
+        self.invalid_rows = invalid_rows
+        self.total = len(rows) + len(invalid_rows)
+        self.done = 0
+        self.success = 0
+        self.failed = 0
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.started_at = datetime.now()
+
+    def config(self, name, default):
+        return self.app.config.get(name, default)
+
+    def run(self):
+        """
+        [10-3.1] 后台线程入口
+        """
+        with self.app.app_context():
+            try:
+                for row in self.invalid_rows:
+                    self.add_result(row, row['status'], row['error_message'], [])
+                self.flush()
+                self.probe_all()
+                self.flush()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"用户 {self.user_id} 的Excel导入失败: {str(e)}")
+                self.emit_progress(finished=True, error=str(e))
+            else:
+                logger.info(f"用户 {self.user_id} 的Excel导入完成: 共 {self.total} 条，"
+                            f"成功 {self.success} 条，失败 {self.failed} 条，"
+                            f"用时 {(datetime.now() - self.started_at).total_seconds():.1f} 秒")
+                self.emit_progress(finished=True)
+            finally:
+                self.manager.job_finished(self.user_id)
+
+    def probe_all(self):
+        """
+        [10-3.2] 并发探测网站
+        按域名分组，每个域名同时最多 URL_IMPORT_HOST_CONCURRENCY 个探测，
+        一个探测结束后再提交同域名的下一个，全局线程数为 URL_IMPORT_MAX_WORKERS
+        """
+        host_limit = self.config('URL_IMPORT_HOST_CONCURRENCY', 2)
+        timeout = self.config('URL_IMPORT_TIMEOUT', 15)
+
+        pending = defaultdict(deque)
+        for row in self.rows:
+            pending[urlparse(row['root_url']).netloc or row['root_url']].append(row)
+        active = defaultdict(int)
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=self.config('URL_IMPORT_MAX_WORKERS', 20),
+                                thread_name_prefix='url-import') as executor:
+            def fill(host):
+                while pending[host] and active[host] < host_limit:
+                    row = pending[host].popleft()
+                    active[host] += 1
+                    futures[executor.submit(probe_site, row, timeout)] = (host, row)
+
+            for host in list(pending):
+                fill(host)
+
+            while futures:
+                done, _ = wait(list(futures), timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, row = futures.pop(future)
+                    active[host] -= 1
+                    status, error_message, menu_data = future.result()
+                    self.add_result(row, status, error_message, menu_data)
+                    fill(host)
+                self.maybe_flush()
+
+    def add_result(self, row, status, error_message, menu_data):
+        self.buffer.append({
+            'user_id': self.user_id,
+            'name': row['name'],
+            'root_url': row['root_url'],
+            'suffix': row['suffix'],
+            'username': row['username'],
+            'password': row['password'],
+            'status': status,
+            'error_message': error_message,
+            'menu_count': len(menu_data),
+            'menu_data': json.dumps(menu_data, ensure_ascii=False) if menu_data else None
+        })
+        self.done += 1
+        if status == 'success':
+            self.success += 1
+        elif status == 'error':
+            self.failed += 1
+
+    def maybe_flush(self):
+        """
+        [10-3.3] 攒够 URL_IMPORT_SAVE_BATCH 条或距上次保存超过1秒时保存
+        """
+        if len(self.buffer) >= self.config('URL_IMPORT_SAVE_BATCH', 50) or \
+                (self.buffer and time.monotonic() - self.last_flush >= 1):
+            self.flush()
+
+    def flush(self):
+        """
+        [10-3.4] 保存缓冲的结果（多行INSERT）并推送进度
+        """
+        from app.models.url_context import BatchUrlFind
+
+        if self.buffer:
+            db.session.execute(db.insert(BatchUrlFind), self.buffer)
+            db.session.commit()
+            self.buffer = []
+        self.last_flush = time.monotonic()
+        self.emit_progress()
+
+    def emit_progress(self, finished=False, error=None):
+        socketio.emit('url_import_progress', {
+            'user_id': self.user_id,
+            'done': self.done,
+            'total': self.total,
+            'success': self.success,
+            'failed': self.failed,
+            'finished': finished,
+            'error': error,
+            'timestamp': datetime.now().strftime('%m-%d %H:%M:%S')
+        }, namespace='/ws')
+
+
+class UrlImportManager:
+    """
+    [10-4] 导入任务管理，每个用户同时只运行一个导入任务
+    """
+
+    def __init__(self):
+        self.app = None
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self, user_id, rows, invalid_rows):
+        """
+        [10-4.1] 启动导入任务，该用户已有任务在运行时返回False
+        """
+        with self.lock:
+            if user_id in self.jobs:
+                return False
+            job = UrlImportJob(self, user_id, rows, invalid_rows)
+            self.jobs[user_id] = job
+
+        threading.Thread(target=job.run, name=f'url-import-{user_id}', daemon=True).start()
+        return True
+
+    def is_running(self, user_id):
+        with self.lock:
+            return user_id in self.jobs
+
+    def job_finished(self, user_id):
+        with self.lock:
+            self.jobs.pop(user_id, None)
+
+
+# [10-5] 全局导入任务管理实例
+url_import_manager = UrlImportManager()
@@ -11,6 +11,9 @@ from app.models.file import File
 from app.models.task_execution import TaskExecution
 from app import db
 from app.scheduler import task_scheduler
+from app.stats import stats_service
+from app.system_monitor import system_monitor
+from app.execution_retention import execution_retention
 
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -35,12 +38,9 @@ def dashboard():
     [5-1] 管理员仪表板
     显示系统整体运行状况和统计信息
     """
-    # [5-1.1] 获取系统统计信息
-    total_users = User.query.count()
-    total_tasks = Task.query.count()
-    running_tasks = Task.query.filter_by(status='running').count()
-    total_files = File.query.count()
-    executed_files = File.query.filter_by(is_executed=True).count()
+    # [5-1.1] 获取系统统计信息（共享的计数缓存，任务状态变化时同步更新）
+    task_counts = stats_service.get_task_status_counts()
+    dashboard_counts = stats_service.get_dashboard_counts()
     
     # [5-1.2] 获取最近活跃用户
     recent_users = User.query.filter(User.last_login.isnot(None))\
@@ -56,12 +56,12 @@ def dashboard():
     scheduler_status = task_scheduler.get_scheduler_status()
     
     system_stats = {
-        'total_users': total_users,
-        'total_tasks': total_tasks,
-        'running_tasks': running_tasks,
-        'total_files': total_files,
-        'executed_files': executed_files,
-        'pending_files': total_files - executed_files,
+        'total_users': dashboard_counts['total_users'],
+        'total_tasks': task_counts['all'],
+        'running_tasks': task_counts['running'],
+        'total_files': dashboard_counts['total_files'],
+        'executed_files': dashboard_counts['executed_files'],
+        'pending_files': dashboard_counts['pending_files'],
         'scheduler_running': scheduler_status['running'],
         'active_jobs': scheduler_status['jobs_count']
     }
@@ -97,18 +97,8 @@ def users():
     users = query.order_by(User.created_at.desc())\
                  .paginate(page=page, per_page=20, error_out=False)
     
-    # [5-2.3] 为每个用户获取统计信息
-    user_stats = {}
-    for user in users.items:
-        file_stats = user.get_upload_stats()
-        task_stats = user.get_task_stats()
-        execution_stats = TaskExecution.get_user_execution_stats(user.id)
-        
-        user_stats[user.id] = {
-            **file_stats,
-            **task_stats,
-            **execution_stats
-        }
+    # [5-2.3] 获取整页用户的统计信息（固定数量的分组查询，短时间缓存）
+    user_stats = stats_service.get_users_stats([user.id for user in users.items])
     
     return render_template('admin/users.html', 
                          users=users, 
@@ -134,18 +124,60 @@ def user_detail(user_id):
                           .order_by(File.upload_time.desc())\
                           .limit(50).all()
     
-    # [5-3.3] 获取用户的执行记录
-    execution_records = db.session.query(TaskExecution)\
-                                 .join(Task, TaskExecution.task_id == Task.id)\
-                                 .filter(Task.user_id == user_id)\
-                                 .order_by(TaskExecution.execution_time.desc())\
-                                 .limit(50).all()
+    # [5-3.3] 获取用户的执行记录（第一页，后续页通过 api_user_executions 按游标获取）
+    execution_records, next_cursor = TaskExecution.get_user_execution_page(user_id, limit=50)
     
     return render_template('admin/user_detail.html',
                          user=user,
                          user_tasks=user_tasks,
                          user_files=user_files,
-                         execution_records=execution_records)
+                         execution_records=execution_records,
+                         next_cursor=next_cursor)
+
+@admin.route('/api/users/<int:user_id>/executions')
+@login_required
+@admin_required
+def api_user_executions(user_id):
+    """
+    [5-3.4] 用户执行记录API（游标分页）
+    参数 cursor 为上一页返回的 next_cursor，limit 为每页条数（最多200）
+    """
+    User.query.get_or_404(user_id)
+
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    try:
+        records, next_cursor = TaskExecution.get_user_execution_page(
+            user_id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': '无效的分页游标'}), 400
+
+    return jsonify({
+        'data': [record.get_execution_info() for record in records],
+        'next_cursor': next_cursor
+    })
+
+@admin.route('/executions/export')
+@login_required
+@admin_required
+def export_executions():
+    """
+    [5-3.5] 导出执行记录
+    参数: task_id、user_id、site（目标网站关键字）、start_date / end_date（YYYY-MM-DD）、format（csv / xlsx）
+    """
+    from app.execution_export import parse_date, build_export_query, export_response
+
+    try:
+        start_date = parse_date(request.args.get('start_date'))
+        end_date = parse_date(request.args.get('end_date'))
+    except ValueError:
+        return jsonify({'error': '日期格式应为 YYYY-MM-DD'}), 400
+
+    stmt = build_export_query(task_id=request.args.get('task_id', type=int),
+                              user_id=request.args.get('user_id', type=int),
+                              site=request.args.get('site', '').strip(),
+                              start_date=start_date,
+                              end_date=end_date)
+    return export_response(stmt, request.args.get('format', 'csv'))
 
 @admin.route('/tasks')
 @login_required
@@ -168,14 +200,7 @@ def tasks():
                .paginate(page=page, per_page=20, error_out=False)
     
     # [5-4.3] 获取任务统计信息
-    task_counts = {
-        'all': Task.query.count(),
-        'running': Task.query.filter_by(status='running').count(),
-        'pending': Task.query.filter_by(status='pending').count(),
-        'completed': Task.query.filter_by(status='completed').count(),
-        'failed': Task.query.filter_by(status='failed').count(),
-        'paused': Task.query.filter_by(status='paused').count()
-    }
+    task_counts = stats_service.get_task_status_counts()
     
     return render_template('admin/tasks.html',
                          tasks=tasks,
@@ -236,30 +261,18 @@ def system():
     # [5-6.1] 获取调度器详细状态
     scheduler_status = task_scheduler.get_scheduler_status()
     
-    # [5-6.2] 获取数据库统计
-    db_stats = {
-        'users_count': User.query.count(),
-        'tasks_count': Task.query.count(),
-        'files_count': File.query.count(),
-        'executions_count': TaskExecution.query.count()
-    }
-    
-    # [5-6.3] 获取系统资源使用情况（简化版本）
-    import psutil
-    import os
+    # [5-6.2] 获取数据库统计（短时间缓存）
+    db_stats = stats_service.get_table_counts()
     
-    system_info = {
-        'cpu_percent': psutil.cpu_percent(interval=1),
-        'memory_percent': psutil.virtual_memory().percent,
-        'disk_usage': psutil.disk_usage('/').percent,
-        'python_version': f"{psutil.python_version()}",
-        'process_id': os.getpid()
-    }
+    # [5-6.3] 系统资源使用情况读取后台采样结果，不在请求中等待CPU采样
+    system_info = system_monitor.latest()
+    system_history = system_monitor.history()
     
     return render_template('admin/system.html',
                          scheduler_status=scheduler_status,
                          db_stats=db_stats,
-                         system_info=system_info)
+                         system_info=system_info,
+                         system_history=system_history)
 
 @admin.route('/api/system_status')
 @login_required
@@ -271,11 +284,12 @@ def api_system_status():
     """
     try:
         # [5-7.1] 获取实时任务统计
+        status_counts = stats_service.get_task_status_counts()
         task_stats = {
-            'running': Task.query.filter_by(status='running').count(),
-            'pending': Task.query.filter_by(status='pending').count(),
-            'completed': Task.query.filter_by(status='completed').count(),
-            'failed': Task.query.filter_by(status='failed').count()
+            'running': status_counts['running'],
+            'pending': status_counts['pending'],
+            'completed': status_counts['completed'],
+            'failed': status_counts['failed']
         }
         
         # [5-7.2] 获取调度器状态
@@ -300,8 +314,41 @@ def api_system_status():
             'task_stats': task_stats,
             'scheduler_running': scheduler_status['running'],
             'active_jobs': scheduler_status['jobs_count'],
-            'recent_executions': executions_data
+            'recent_executions': executions_data,
+            'system_info': system_monitor.latest(),
+            'execution_retention': execution_retention.stats()
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@admin.route('/api/system_metrics')
+@login_required
+@admin_required
+def api_system_metrics():
+    """
+    [5-8] 系统资源采样历史API
+    返回最近一次采样和历史采样，用于绘制趋势图；limit 指定返回的历史条数
+    """
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'latest': system_monitor.latest(),
+        'history': system_monitor.history(limit)
+    })
+
+@admin.route('/api/execution_retention', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def api_execution_retention():
+    """
+    [5-9] 执行记录清理API
+    GET 返回最近一次清理的进度；POST 立即在后台按保留天数清理一次
+    """
+    if request.method == 'POST':
+        if execution_retention.retention_days() <= 0:
+            return jsonify({'success': False, 'message': '未配置执行记录保留天数'}), 400
+        if not execution_retention.run_in_background():
+            return jsonify({'success': False, 'message': '清理正在进行中'}), 409
+        return jsonify({'success': True, 'message': '已开始清理'})
+
+    return jsonify(execution_retention.stats())
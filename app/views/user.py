@@ -11,9 +11,9 @@ from flask_login import login_required, current_user
 from app.models.user import User
 from app.models.file import File
 from app.models.task import Task
-from app.models.task_execution import TaskExecution
+from app.models.task_execution import TaskExecution, TaskExecutionDaily
 from app import db
-from app.models.url_context import UrlUpdateContext, UrlMenu
+from app.models.url_context import UrlUpdateContext, UrlMenu, site_directory
 import shutil
 user = Blueprint('user', __name__, url_prefix='/user')
 from app.scheduler import task_scheduler
@@ -129,10 +129,18 @@ def upload_files():
     POST: 处理批量文件上传
     """
     if request.method == 'POST':
+        # 页面脚本分批并行上传，以JSON返回每个文件的结果；普通表单提交仍然跳转到文件列表
+        wants_json = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        
+        def upload_error(message):
+            if wants_json:
+                return jsonify({'success': False, 'message': message}), 400
+            flash(message, 'error')
+            return redirect(request.url)
+        
         # [2-2.1] 检查是否有文件被上传
         if 'files' not in request.files:
-            flash('请选择要上传的文件', 'error')
-            return redirect(request.url)
+            return upload_error('请选择要上传的文件')
 
         # 传文件四：
         # request.files.getlist('files') 从HTTP请求中获取文件流
@@ -140,8 +148,7 @@ def upload_files():
         # 返回的 file 对象是 FileStorage 类型，它是一个类文件对象（file-like object）
         files = request.files.getlist('files')
         if not files or files[0].filename == '':
-            flash('请选择要上传的文件', 'error')
-            return redirect(request.url)
+            return upload_error('请选择要上传的文件')
         
         # [2-2.2] 获取目标文件夹
         target_folder = request.form.get('target_folder', '')
@@ -151,56 +158,47 @@ def upload_files():
         if target_folder:
             target_path = os.path.join(user_upload_dir, target_folder)
             if not os.path.exists(target_path):
-                flash('指定的文件夹不存在', 'error')
-                return redirect(request.url)
+                return upload_error('指定的文件夹不存在')
         else:
             target_path = user_upload_dir
         
-        uploaded_count = 0
-        failed_count = 0
-        
-        # [2-2.3] 批量处理上传的文件
+        # [2-2.3] 过滤不允许的文件类型
+        results = []
+        accepted_files = []
         for file in files:
             if file and allowed_file(file.filename):
-                try:
-                    # 只保留文件名，去除可能的路径信息
-                    original_filename = os.path.basename(file.filename)
-                    file_path = os.path.join(target_path, original_filename)
-                    
-                    # [2-2.5] 保存文件到磁盘
-                    file.save(file_path)    # 核心IO操作
-                    file_size = os.path.getsize(file_path)
-                    
-                    # [2-2.6] 保存文件信息到数据库
-                    file_record = File(
-                        user_id=current_user.id,
-                        original_filename=original_filename,
-                        filename=original_filename,
-                        file_path=file_path,
-                        file_size=file_size,
-                        folder=target_folder
-                    )
-                    db.session.add(file_record)
-                    uploaded_count += 1
-                    
-                except Exception as e:
-                    failed_count += 1
-                    current_app.logger.error(f"文件上传失败: {file.filename}, 错误: {str(e)}")
+                accepted_files.append(file)
             else:
-                failed_count += 1
+                results.append({'filename': os.path.basename(file.filename or ''), 'success': False,
+                                'file_size': None, 'error': '只支持TXT文件'})
         
-        # [2-2.7] 提交数据库事务
+        # [2-2.5] 线程池分块写入磁盘，[2-2.6] 多行INSERT保存文件记录
+        from app.file_upload import file_uploader
         try:
-            db.session.commit()
-            if uploaded_count > 0:
-                flash(f'成功上传 {uploaded_count} 个文件', 'success')
-            if failed_count > 0:
-                flash(f'{failed_count} 个文件上传失败', 'warning')
+            results.extend(file_uploader.save_files(accepted_files, target_path, current_user.id, target_folder))
         except Exception as e:
-            db.session.rollback()
-            flash('文件上传失败，请重试', 'error')
             current_app.logger.error(f"数据库保存失败: {str(e)}")
+            if wants_json:
+                return jsonify({'success': False, 'message': '文件上传失败，请重试'}), 500
+            flash('文件上传失败，请重试', 'error')
+            return redirect(url_for('user.file_list'))
+        
+        # [2-2.7] 返回上传结果
+        uploaded_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - uploaded_count
+        
+        if wants_json:
+            return jsonify({
+                'success': True,
+                'uploaded_count': uploaded_count,
+                'failed_count': failed_count,
+                'results': results
+            })
         
+        if uploaded_count > 0:
+            flash(f'成功上传 {uploaded_count} 个文件', 'success')
+        if failed_count > 0:
+            flash(f'{failed_count} 个文件上传失败', 'warning')
         return redirect(url_for('user.file_list'))
     
     # GET请求时获取用户文件夹列表
@@ -463,55 +461,12 @@ def create_task():
                 daily_start_time = datetime.strptime(daily_start_time_str, '%H:%M').time()
             
             # [3-2.3] 检查是否有可执行的文件
-
-            # #             # [3-2.3] 检查是否有可执行的文件
-            # pending_files_query = File.query.filter_by(
-            #     user_id=current_user.id,
-            #     is_executed=False
-            # ).filter(
-            #     db.or_(
-            #         File.file_path.like(f'%/{source_folder}/%'),  # Linux/Mac路径
-            #         File.file_path.like(r'%\\\\' +f'{source_folder}' + r'\\\\%')  # Windows路径
-            #     )
-            # )
-            
-            # # 获取查询结果数量
-            # # 获取查询结果
-            # pending_files = pending_files_query.all()
-            # print(pending_files_query)
-            # pending_files_count = len(pending_files)
-            
-            # # 打印生成的 SQL（移到count()之后）
-            # print(str(pending_files_query.statement.compile(compile_kwargs={"literal_binds": True})))
-            # 
-            # 上面方式查询 结果为0 
-            # 使用原生SQL查询
-            sql = """
-SELECT COUNT(*) as count 
-FROM files 
-WHERE user_id = :user_id 
-AND is_executed = false 
-AND (file_path LIKE :path1 OR file_path LIKE :path2)
-"""
-
-            # 构建路径参数
-            path1 = f'%/{source_folder}/%'  # Linux/Mac路径
-            path2 = f'%\\\\{source_folder}\\\\%'  # Windows路径
-
-            # 执行原生SQL查询
-            result = db.session.execute(db.text(sql), {
-                'user_id': current_user.id,
-                'path1': path1,
-                'path2': path2
-            }).fetchone()
-
-            pending_files_count = result.count if result else 0
-
-            print(f"SQL查询: {sql}")
-            print(f"参数: user_id={current_user.id}, path1={path1}, path2={path2}")
-            print(f"查询结果: {pending_files_count}")
-            
-  
+            # 按 folder 列走 ix_files_claim 索引计数，不再用 LIKE '%/folder/%' 扫描全部文件
+            pending_files_count = File.query.filter_by(
+                user_id=current_user.id,
+                folder=File.normalize_folder(source_folder),
+                is_executed=False
+            ).count()
             
             if pending_files_count == 0:
                 flash(f'指定文件夹 "{source_folder}" 中没有可执行的文件，请先上传文件', 'error')
@@ -583,6 +538,56 @@ def task_detail(task_id):
                          task=task, 
                          execution_history=execution_history)
 
+@user.route('/tasks/<int:task_id>/history', methods=['GET'])
+@login_required
+def get_task_history(task_id):
+    """
+    [3-3.2.1] 获取任务执行历史的 API 接口（游标分页）
+    参数 cursor 为上一页返回的 next_cursor，limit 为每页条数（最多200）
+    """
+    task = Task.query.filter_by(id=task_id, user_id=current_user.id).first()
+    if not task:
+        return jsonify({'error': '任务不存在'}), 404
+
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    try:
+        records, next_cursor = TaskExecution.get_task_execution_page(
+            task_id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': '无效的分页游标'}), 400
+
+    return jsonify({
+        'success': True,
+        'data': [record.get_execution_info() for record in records],
+        'next_cursor': next_cursor
+    })
+
+@user.route('/executions/export', methods=['GET'])
+@login_required
+def export_executions():
+    """
+    [3-3.2.2] 导出当前用户的执行记录
+    参数: task_id、site（目标网站关键字）、start_date / end_date（YYYY-MM-DD）、format（csv / xlsx）
+    """
+    from app.execution_export import parse_date, build_export_query, export_response
+
+    task_id = request.args.get('task_id', type=int)
+    if task_id is not None and not Task.query.filter_by(id=task_id, user_id=current_user.id).first():
+        return jsonify({'error': '任务不存在'}), 404
+
+    try:
+        start_date = parse_date(request.args.get('start_date'))
+        end_date = parse_date(request.args.get('end_date'))
+    except ValueError:
+        return jsonify({'error': '日期格式应为 YYYY-MM-DD'}), 400
+
+    stmt = build_export_query(task_id=task_id,
+                              user_id=current_user.id,
+                              site=request.args.get('site', '').strip(),
+                              start_date=start_date,
+                              end_date=end_date)
+    return export_response(stmt, request.args.get('format', 'csv'))
+
 @user.route('/tasks/<int:task_id>/stats', methods=['GET'])
 @login_required
 def get_task_stats(task_id):
@@ -641,8 +646,11 @@ def delete_task_history(task_id):
         return jsonify({'success': False, 'message': '任务不存在'}), 404
     
     try:
-        # 删除该任务的所有执行历史记录
-        deleted_count = TaskExecution.query.filter_by(task_id=task_id).delete()
+        # 分块删除该任务的所有历史执行记录，每块单独提交，不长时间锁表
+        from app.execution_retention import execution_retention
+        deleted_count = execution_retention.purge_task(task_id)
+        # 同时清空该任务的每日汇总
+        TaskExecutionDaily.query.filter_by(task_id=task_id).delete()
         db.session.commit()
         
         current_app.logger.info(f"用户 {current_user.id} 删除了任务 {task_id} 的 {deleted_count} 条历史记录")
@@ -697,6 +705,8 @@ def pause_task(task_id):
     
     if task.status == 'running':
         task.pause_task()
+        # 移除调度并释放该任务预留的文件
+        task_scheduler.remove_task_job(task_id)
         flash(f'任务 "{task.task_name}" 已暂停', 'success')
     else:
         flash('只能暂停正在运行的任务', 'warning')
@@ -759,7 +769,7 @@ def url_management():
     
     # 获取用户的批量查询结果
     from app.models.url_context import BatchUrlFind
-    batch_results = BatchUrlFind.query.filter_by(user_id=current_user.id).all()
+    batch_results = BatchUrlFind.query.filter_by(user_id=current_user.id).order_by(BatchUrlFind.id.asc()).all()
     
     # 转换格式以兼容前端
     batch_results_data = []
@@ -772,6 +782,7 @@ def url_management():
                 menu_data = []
         
         batch_results_data.append({
+            'id': result.id,
             'name': result.name,
             'root_url': result.root_url,
             'suffix': result.suffix,
@@ -788,11 +799,15 @@ def url_management():
     menu_data = flask_session.get('temp_menu_data')
     url_data = flask_session.get('temp_url_data')
     
+    # Excel导入是否仍在后台进行
+    from app.url_import import url_import_manager
+    
     return render_template('user/url_management.html', 
                          url_contexts=url_contexts,
                          batch_results=batch_results_data,
                          menu_data=menu_data,
-                         url_data=url_data)
+                         url_data=url_data,
+                         import_running=url_import_manager.is_running(current_user.id))
 
 @user.route('/api/test_url_menu', methods=['POST'])
 @login_required
@@ -817,14 +832,12 @@ def test_url_menu():
         # 导入测试模块
         import test
         from app.models.url_context import url_update_context
-        import requests
         
-        # 创建会话和上下文
-        session = requests.Session()
-        upload_context = url_update_context(session, root_url, suffix, username, password)
+        # 创建上下文，检测账号密码时使用一次性session，不经过登录会话池
+        upload_context = url_update_context(None, root_url, suffix, username, password)
         
         # 获取菜单数据
-        menu_data = test.get_menu(upload_context)
+        menu_data = test.get_menu(upload_context, use_pool=False)
         
         if menu_data:
             # 将菜单数据存储到session中，供后续添加使用
@@ -927,6 +940,7 @@ def add_url_context():
             db.session.add(url_menu)
         
         db.session.commit()
+        site_directory.invalidate()
         
         # 清除临时数据
         flask_session.pop('temp_menu_data', None)
@@ -957,6 +971,7 @@ def delete_url_context(context_id):
         # 删除URL上下文（由于cascade='all, delete-orphan'，关联的菜单会自动删除）
         db.session.delete(url_context)
         db.session.commit()
+        site_directory.invalidate()
         
         flash('URL上下文删除成功', 'success')
         return redirect(url_for('user.url_management'))
@@ -999,7 +1014,7 @@ def update_url_context_name(context_id):
 def batch_upload_excel():
     """
     批量上传Excel文件处理
-    读取Excel文件，解析每行数据，获取菜单数据
+    读取并校验Excel数据，启动后台任务获取菜单数据
     """
     try:
         # 检查是否有文件上传
@@ -1017,139 +1032,39 @@ def batch_upload_excel():
             flash('请上传Excel文件(.xlsx或.xls格式)', 'error')
             return redirect(url_for('user.url_management'))
         
-        # 导入pandas处理Excel
-        import pandas as pd
-        import io
-        import test
-        from app.models.url_context import url_update_context, BatchUrlFind
-        import requests
-        import json
+        from app.models.url_context import BatchUrlFind
+        from app.url_import import url_import_manager, read_import_sheet, parse_import_rows
         
-        # 读取Excel文件
-        file_content = file.read()
-        df = pd.read_excel(io.BytesIO(file_content))
+        if url_import_manager.is_running(current_user.id):
+            flash('上一次Excel导入仍在进行中，请等待完成后再上传', 'warning')
+            return redirect(url_for('user.url_management'))
         
-        # 检查列数
-        if len(df.columns) < 5:
-            flash('Excel文件格式错误：需要至少5列数据', 'error')
+        # 读取Excel文件，按列清洗、校验并去除文件内重复的网站
+        try:
+            df = read_import_sheet(file.stream, file.filename)
+        except ValueError as e:
+            flash(str(e), 'error')
             return redirect(url_for('user.url_management'))
+        rows, invalid_rows = parse_import_rows(df)
+        
+        # 一次查询检查哪些URL上下文已存在
+        existing_pairs = UrlUpdateContext.get_existing_pairs(
+            (record['root_url'], record['suffix']) for record in rows)
+        if existing_pairs:
+            invalid_rows.extend({**record, 'status': 'error', 'error_message': 'URL上下文已存在'}
+                                for record in rows if (record['root_url'], record['suffix']) in existing_pairs)
+            rows = [record for record in rows if (record['root_url'], record['suffix']) not in existing_pairs]
         
         # 先清除用户之前的批量查询记录
         BatchUrlFind.query.filter_by(user_id=current_user.id).delete()
         db.session.commit()
         
-        # 处理每行数据
-        for index, row in df.iterrows():
-            try:
-                # 获取每行数据
-                name = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else f'未命名_{index+1}'
-                root_url = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ''
-                suffix = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ''
-                username = str(row.iloc[3]).strip() if pd.notna(row.iloc[3]) else ''
-                password = str(row.iloc[4]).strip() if pd.notna(row.iloc[4]) else ''
-                
-                # 验证必要字段
-                if not all([root_url, suffix, username, password]):
-                    batch_record = BatchUrlFind(
-                        user_id=current_user.id,
-                        name=name,
-                        root_url=root_url,
-                        suffix=suffix,
-                        username=username,
-                        password=password,
-                        status='error',
-                        error_message='缺少必要字段',
-                        menu_count=0
-                    )
-                    db.session.add(batch_record)
-                    continue
-                
-                # 检查是否已存在相同的URL上下文
-                existing = UrlUpdateContext.query.filter_by(
-                    root_url=root_url, 
-                    suffix=suffix
-                ).first()
-                
-                if existing:
-                    batch_record = BatchUrlFind(
-                        user_id=current_user.id,
-                        name=name,
-                        root_url=root_url,
-                        suffix=suffix,
-                        username=username,
-                        password=password,
-                        status='error',
-                        error_message='URL上下文已存在',
-                        menu_count=0
-                    )
-                    db.session.add(batch_record)
-                    continue
-                
-                # 尝试获取菜单数据
-                try:
-                    session = requests.Session()
-                    upload_context = url_update_context(session, root_url, suffix, username, password)
-                    menu_data = test.get_menu(upload_context)
-                    
-                    if menu_data and len(menu_data) > 0:
-                        batch_record = BatchUrlFind(
-                            user_id=current_user.id,
-                            name=name,
-                            root_url=root_url,
-                            suffix=suffix,
-                            username=username,
-                            password=password,
-                            status='success',
-                            error_message=None,
-                            menu_count=len(menu_data),
-                            menu_data=json.dumps(menu_data, ensure_ascii=False)
-                        )
-                    else:
-                        batch_record = BatchUrlFind(
-                            user_id=current_user.id,
-                            name=name,
-                            root_url=root_url,
-                            suffix=suffix,
-                            username=username,
-                            password=password,
-                            status='no_menu',
-                            error_message='未获取到菜单数据',
-                            menu_count=0
-                        )
-                    db.session.add(batch_record)
-                        
-                except Exception as e:
-                    batch_record = BatchUrlFind(
-                        user_id=current_user.id,
-                        name=name,
-                        root_url=root_url,
-                        suffix=suffix,
-                        username=username,
-                        password=password,
-                        status='error',
-                        error_message=f'获取菜单失败: {str(e)}',
-                        menu_count=0
-                    )
-                    db.session.add(batch_record)
-                    
-            except Exception as e:
-                batch_record = BatchUrlFind(
-                    user_id=current_user.id,
-                    name=f'第{index+1}行',
-                    root_url='',
-                    suffix='',
-                    username='',
-                    password='',
-                    status='error',
-                    error_message=f'处理行数据失败: {str(e)}',
-                    menu_count=0
-                )
-                db.session.add(batch_record)
-        
-        # 提交所有记录
-        db.session.commit()
+        # 启动后台探测任务，进度通过websocket推送
+        if not url_import_manager.start(current_user.id, rows, invalid_rows):
+            flash('上一次Excel导入仍在进行中，请等待完成后再上传', 'warning')
+            return redirect(url_for('user.url_management'))
         
-        flash(f'Excel文件处理完成，共处理 {len(df)} 条记录', 'success')
+        flash(f'Excel文件已读取，共 {len(rows) + len(invalid_rows)} 条记录，正在后台检索菜单', 'success')
         return redirect(url_for('user.url_management'))
         
     except Exception as e:
@@ -1168,66 +1083,55 @@ def confirm_batch_upload():
         from app.models.url_context import BatchUrlFind
         import json
         
-        # 获取用户选择的项目
-        selected_indices = request.form.getlist('selected_items')
+        # 获取用户选择的项目（batch_url_find 记录ID）
+        selected_ids = [int(id_str) for id_str in request.form.getlist('selected_items') if id_str.isdigit()]
         
-        if not selected_indices:
+        if not selected_ids:
             flash('请选择要添加的项目', 'error')
             return redirect(url_for('user.url_management'))
         
-        # 处理选中的项目
-        success_count = 0
-        error_count = 0
+        # 一次查询取出选中且检索成功的记录
+        batch_records = BatchUrlFind.query.filter(
+            BatchUrlFind.user_id == current_user.id,
+            BatchUrlFind.id.in_(selected_ids),
+            BatchUrlFind.status.in_(['success', 'no_menu'])
+        ).order_by(BatchUrlFind.id.asc()).all()
+        
+        # 排除已存在和重复选择的URL上下文
+        existing_pairs = UrlUpdateContext.get_existing_pairs(
+            (record.root_url, record.suffix) for record in batch_records)
+        new_contexts = []
+        for batch_record in batch_records:
+            pair = (batch_record.root_url, batch_record.suffix)
+            if pair in existing_pairs:
+                continue
+            existing_pairs.add(pair)
+            
+            menus = []
+            if batch_record.menu_data:
+                try:
+                    menus = [(menu_item[0], menu_item[1]) for menu_item in json.loads(batch_record.menu_data)]
+                except (ValueError, TypeError, IndexError):
+                    menus = []
+            new_contexts.append({
+                'name': batch_record.name,
+                'root_url': batch_record.root_url,
+                'suffix': batch_record.suffix,
+                'username': batch_record.username,
+                'password': batch_record.password,
+                'menus': menus
+            })
         
-        for index_str in selected_indices:
-            try:
-                index = int(index_str)
-                batch_record = BatchUrlFind.query.filter_by(
-                    user_id=current_user.id
-                ).offset(index).first()
-                
-                if batch_record and batch_record.status in ['success', 'no_menu']:
-                    # 创建URL上下文
-                    url_context = UrlUpdateContext(
-                        name=batch_record.name,
-                        root_url=batch_record.root_url,
-                        suffix=batch_record.suffix,
-                        username=batch_record.username,
-                        password=batch_record.password
-                    )
-                    db.session.add(url_context)
-                    db.session.flush()  # 获取ID
-                    
-                    # 添加菜单数据（如果有的话）
-                    if batch_record.menu_data:
-                        try:
-                            menu_data = json.loads(batch_record.menu_data)
-                            for menu_item in menu_data:
-                                menu_value = menu_item[0]
-                                menu_text = menu_item[1]
-                                
-                                url_menu = UrlMenu(
-                                    context_id=url_context.id,
-                                    menu_value=menu_value,
-                                    menu_text=menu_text
-                                )
-                                db.session.add(url_menu)
-                        except:
-                            pass
-                    
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-            except Exception as e:
-                error_count += 1
-                print(f'处理第{index_str}项时出错: {str(e)}')
+        # 批量添加URL上下文和菜单
+        success_count = UrlUpdateContext.bulk_create(new_contexts)
+        error_count = len(selected_ids) - success_count
         
         # 删除所有批量查询记录
         BatchUrlFind.query.filter_by(user_id=current_user.id).delete()
         
         # 提交事务
         db.session.commit()
+        site_directory.invalidate()
         
         flash(f'批量添加完成：成功 {success_count} 项，失败 {error_count} 项', 'success')
         return redirect(url_for('user.url_management'))
@@ -1288,6 +1192,7 @@ def batch_delete_url_contexts():
                 deleted_count += 1
         
         db.session.commit()
+        site_directory.invalidate()
         
         flash(f'成功删除 {deleted_count} 个URL上下文', 'success')
         return redirect(url_for('user.url_management'))
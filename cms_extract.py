@@ -0,0 +1,144 @@
+"""
+帝国CMS页面信息提取
+test.py 只需要从后台页面中取固定的几项内容（隐藏字段、成功提示、编码、onclick里的url），
+这里用预编译的正则直接定位标签，不再为每个响应构建完整的 BeautifulSoup 文档树
+"""
+import html
+import re
+from functools import lru_cache
+
+# 标签属性部分：允许引号内出现 '>'
+_ATTRS = r'''((?:[^>"']|"[^"]*"|'[^']*')*)'''
+
+INPUT_TAG_PATTERN = re.compile(r'<input\b' + _ATTRS + r'/?>', re.IGNORECASE)
+A_TAG_PATTERN = re.compile(r'<a\b' + _ATTRS + r'>', re.IGNORECASE)
+SCRIPT_SRC_PATTERN = re.compile(r'<script\b' + _ATTRS + r'>', re.IGNORECASE)
+SCRIPT_BODY_PATTERN = re.compile(r'<script\b' + _ATTRS + r'>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+FORM_PATTERN = re.compile(r'<form\b.*?</form\s*>', re.IGNORECASE | re.DOTALL)
+ATTR_PATTERN = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?''')
+CHARSET_TD_PATTERN = re.compile(r'<td\b' + _ATTRS + r'>\s*(GBK|UTF-8)\s*</td\s*>', re.IGNORECASE)
+ADDNEWS_TEMPLATE_PATTERN = re.compile(r"self\.location\.href='([^']*AddNews\.php[^']*)'")
+
+SUCCESS_MARKER = '增加信息成功'
+
+
+def parse_attrs(attrs_text):
+    """
+    解析标签属性为字典，属性名小写，属性值做HTML实体解码
+    """
+    attrs = {}
+    for match in ATTR_PATTERN.finditer(attrs_text):
+        name = match.group(1).lower()
+        if name in attrs:
+            continue
+        value = match.group(2)
+        if value is None:
+            value = match.group(3)
+        if value is None:
+            value = match.group(4)
+        attrs[name] = html.unescape(value) if value is not None else ''
+    return attrs
+
+
+def hidden_inputs(page_html, form_only=False):
+    """
+    提取 type=hidden 的input字段 {name: value}
+    form_only=True 时只取 <form> 内的字段
+    """
+    if form_only:
+        regions = [match.group(0) for match in FORM_PATTERN.finditer(page_html)]
+    else:
+        regions = [page_html]
+
+    fields = {}
+    for region in regions:
+        for match in INPUT_TAG_PATTERN.finditer(region):
+            # 先做字符串判断，跳过绝大多数非隐藏字段，避免逐个解析属性
+            if 'hidden' not in match.group(1).lower():
+                continue
+            attrs = parse_attrs(match.group(1))
+            if attrs.get('type', '').lower() == 'hidden' and 'name' in attrs:
+                fields[attrs['name']] = attrs.get('value', '')
+    return fields
+
+
+def contains_success(page_html):
+    """
+    判断页面是否包含“增加信息成功”提示
+    """
+    return bool(page_html) and SUCCESS_MARKER in page_html
+
+
+def detect_charset(page_html):
+    """
+    从系统信息页的 <td>GBK</td> / <td>UTF-8</td> 判断网站编码
+    返回 'GBK'、'UTF-8'，都没有时返回None
+    """
+    found = {match.group(2).upper() for match in CHARSET_TD_PATTERN.finditer(page_html)}
+    if 'GBK' in found:
+        return 'GBK'
+    if 'UTF-8' in found:
+        return 'UTF-8'
+    return None
+
+
+def find_link_href(page_html, title):
+    """
+    查找指定title且带href的<a>标签，返回href
+    """
+    for match in A_TAG_PATTERN.finditer(page_html):
+        attrs = parse_attrs(match.group(1))
+        if attrs.get('title') == title and attrs.get('href'):
+            return attrs['href']
+    return None
+
+
+@lru_cache(maxsize=32)
+def _td_text_pattern(text):
+    return re.compile(r'<td\b' + _ATTRS + r'>' + re.escape(text) + r'</td\s*>', re.IGNORECASE)
+
+
+def find_td_onclick(page_html, text):
+    """
+    查找文本恰好为text的<td>，返回其onclick属性
+    """
+    for match in _td_text_pattern(text).finditer(page_html):
+        onclick = parse_attrs(match.group(1)).get('onclick')
+        if onclick:
+            return onclick
+    return None
+
+
+def find_input_onclick(page_html, value):
+    """
+    查找value为指定值的<input>按钮，返回其onclick属性
+    """
+    for match in INPUT_TAG_PATTERN.finditer(page_html):
+        attrs = parse_attrs(match.group(1))
+        if attrs.get('value') == value:
+            return attrs.get('onclick')
+    return None
+
+
+def first_script_src(page_html):
+    """
+    返回页面中第一个带src的<script>标签的src
+    """
+    for match in SCRIPT_SRC_PATTERN.finditer(page_html):
+        src = parse_attrs(match.group(1)).get('src')
+        if src is not None:
+            return src
+    return None
+
+
+def find_addnews_template(page_html):
+    """
+    从包含 changeclass 函数的脚本中提取 AddNews.php 的url模板
+    返回 (脚本内容, 模板)，没有对应脚本或模板时相应位置为None
+    """
+    for match in SCRIPT_BODY_PATTERN.finditer(page_html):
+        script_content = match.group(2)
+        if 'changeclass' in script_content:
+            template_match = ADDNEWS_TEMPLATE_PATTERN.search(script_content)
+            return script_content, template_match.group(1) if template_match else None
+    return None, None
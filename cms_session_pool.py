@@ -0,0 +1,227 @@
+"""
+帝国CMS登录会话池
+按网站缓存已登录的 requests.Session，以及登录后得到的 zixun_page、ifGBK 和 ehash，
+upload_before / upload / refresh_all / get_menu 共用同一个会话，
+只有检测到登录页或 ehash 失效时才重新登录
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+# 登录失效时后台返回页面中的特征文本
+LOGIN_EXPIRED_MARKERS = (
+    '您还未登录',
+    '登录超时',
+    '您来自的链接不存在',
+)
+
+# 后台登录表单：<input type="hidden" name="enews" value="login">
+LOGIN_FORM_PATTERN = re.compile(r'''name=["']?enews["']?\s+value=["']?login["'\s>]''', re.IGNORECASE)
+
+EHASH_PATTERN = re.compile(r'(\?ehash_[^=]+=[^&]+)')
+
+# 上传表单隐藏字段的缓存时间（秒），提交失败时立即失效
+UPLOAD_FORM_TTL = 300
+
+# 上传表单中每次打开都会变化的隐藏字段，不缓存，使用缓存时按帝国CMS的规则重新生成
+# filepass 为打开表单时的时间戳，提交时用来把本篇文章的附件（远程保存的图片）关联到新信息
+DYNAMIC_FORM_FIELDS = {
+    'filepass': lambda: str(int(time.time())),
+}
+
+
+def is_login_expired(html):
+    """
+    判断返回的页面是否为登录页或登录失效提示
+    """
+    if not html:
+        return False
+    if any(marker in html for marker in LOGIN_EXPIRED_MARKERS):
+        return True
+    return LOGIN_FORM_PATTERN.search(html) is not None
+
+
+class SiteSession:
+    """
+    单个网站的登录会话
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.Lock()
+        self.session = None
+        self.zixun_page = None
+        self.zixun_page_url = None
+        self.ifGBK = False
+        self.ehash = None
+        self.logged_in_at = None
+        # AddNews.php 的url模板，从 zixun_page 中解析一次
+        self.addnews_template = None
+        # 按栏目缓存上传表单的固定隐藏字段 {menu_value: (static_inputs, dynamic_fields, expires_at)}
+        self.upload_forms = {}
+        # 每个栏目最近一次实际获取到的表单，用于发现值会变化的字段
+        self.last_forms = {}
+        # 比较实际表单发现的、值会变化的字段（重新登录后仍然保留）
+        self.volatile_fields = set()
+        self.forms_lock = threading.Lock()
+
+    @property
+    def logged_in(self):
+        return self.zixun_page is not None
+
+    def reset(self):
+        """清除登录状态，下次使用时重新登录"""
+        if self.session is not None:
+            self.session.close()
+        self.session = None
+        self.zixun_page = None
+        self.zixun_page_url = None
+        self.ifGBK = False
+        self.ehash = None
+        self.logged_in_at = None
+        self.addnews_template = None
+        with self.forms_lock:
+            self.upload_forms.clear()
+            self.last_forms.clear()
+
+    def get_upload_form(self, menu_value):
+        """
+        获取栏目上传表单的隐藏字段，会变化的字段按规则重新生成
+        缓存过期或不存在时返回None
+        """
+        with self.forms_lock:
+            cached = self.upload_forms.get(str(menu_value))
+            if cached is None:
+                return None
+            static_inputs, dynamic_fields, expires_at = cached
+            if time.time() >= expires_at:
+                del self.upload_forms[str(menu_value)]
+                return None
+
+        hidden_inputs = dict(static_inputs)
+        for name in dynamic_fields:
+            hidden_inputs[name] = DYNAMIC_FORM_FIELDS[name]()
+        return hidden_inputs
+
+    def set_upload_form(self, menu_value, hidden_inputs, ttl=UPLOAD_FORM_TTL):
+        """
+        根据实际获取到的表单缓存栏目上传表单的固定隐藏字段
+        与该栏目上次获取的表单比较，值变化的字段记为会变化的字段，此后不再缓存；
+        表单中含有无法重新生成的变化字段时不缓存，每篇文章都重新获取表单
+        """
+        key = str(menu_value)
+        with self.forms_lock:
+            previous = self.last_forms.get(key)
+            if previous is not None:
+                changed = {name for name, value in hidden_inputs.items()
+                           if name in previous and previous[name] != value
+                           and name not in DYNAMIC_FORM_FIELDS and name not in self.volatile_fields}
+                if changed:
+                    logger.warning(f"网站 {self.key[0]} 上传表单的字段 {sorted(changed)} 每次获取都不同，不再缓存")
+                    self.volatile_fields |= changed
+                    # 其他栏目的缓存中也可能含有这些字段
+                    for other_key, (static_inputs, _, _) in list(self.upload_forms.items()):
+                        if changed & static_inputs.keys():
+                            del self.upload_forms[other_key]
+            self.last_forms[key] = dict(hidden_inputs)
+
+            dynamic_fields = [name for name in hidden_inputs
+                              if name in DYNAMIC_FORM_FIELDS or name in self.volatile_fields]
+            if any(name not in DYNAMIC_FORM_FIELDS for name in dynamic_fields):
+                self.upload_forms.pop(key, None)
+                return
+            static_inputs = {name: value for name, value in hidden_inputs.items() if name not in dynamic_fields}
+            self.upload_forms[key] = (static_inputs, dynamic_fields, time.time() + ttl)
+
+    def drop_upload_form(self, menu_value):
+        """提交失败时丢弃栏目表单缓存，下次重新获取"""
+        with self.forms_lock:
+            self.upload_forms.pop(str(menu_value), None)
+
+
+class SiteSessionPool:
+    """
+    以 (base_url, username, 密码摘要) 为键的登录会话池
+    密码修改后键随之变化，不会继续复用旧密码登录的会话
+    """
+
+    def __init__(self):
+        self.sites = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key_for(update_context):
+        password_digest = hashlib.sha256((update_context.password or '').encode('utf-8')).hexdigest()
+        return update_context.base_url, update_context.username, password_digest
+
+    def get_site(self, update_context):
+        """获取网站会话条目，不存在时创建（未登录状态）"""
+        key = self.key_for(update_context)
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None:
+                site = SiteSession(key)
+                self.sites[key] = site
+            return site
+
+    def acquire(self, update_context, login_func):
+        """
+        获取已登录的网站会话
+        未登录时用新的 requests.Session 调用 login_func 登录一次，
+        并把会话写回 update_context.session，供调用方继续使用
+        """
+        site = self.get_site(update_context)
+        with site.lock:
+            if not site.logged_in:
+                site.session = requests.Session()
+                update_context.session = site.session
+
+                result = login_func(update_context)
+                if not result:
+                    site.reset()
+                    raise Exception(f"登录失败: {update_context.base_url}")
+
+                site.zixun_page, site.zixun_page_url, site.ifGBK = result
+                match = EHASH_PATTERN.search(site.zixun_page_url or '')
+                site.ehash = match.group(0) if match else None
+                site.logged_in_at = time.time()
+
+            update_context.session = site.session
+            return site
+
+    def invalidate(self, update_context):
+        """使网站会话失效，下次 acquire 时重新登录"""
+        site = self.get_site(update_context)
+        with site.lock:
+            site.reset()
+
+    def find_site(self, session):
+        """根据 requests.Session 对象找到对应的网站会话，不在池中时返回None"""
+        with self.lock:
+            for site in self.sites.values():
+                if site.session is session:
+                    return site
+        return None
+
+    def invalidate_session(self, session):
+        """根据 requests.Session 对象找到对应网站并使其失效"""
+        with self.lock:
+            sites = [site for site in self.sites.values() if site.session is session]
+        for site in sites:
+            with site.lock:
+                if site.session is session:
+                    site.reset()
+
+    def stats(self):
+        """会话池统计信息"""
+        with self.lock:
+            sites = list(self.sites.values())
+        return {
+            'sites': len(sites),
+            'logged_in': len([site for site in sites if site.logged_in])
+        }
@@ -30,11 +30,67 @@ class Config:
     UPLOAD_FOLDER = r'D:\python\auto_upload_claude\file_task_manager\file_task_manager\上传文件'
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
     ALLOWED_EXTENSIONS = {'txt'}
+    # 写入上传文件的线程数，每个多行INSERT保存的文件记录数
+    UPLOAD_SAVE_WORKERS = int(os.environ.get('UPLOAD_SAVE_WORKERS', 8))
+    UPLOAD_INSERT_BATCH = int(os.environ.get('UPLOAD_INSERT_BATCH', 500))
     
     # [任务调度配置]
     SCHEDULER_API_ENABLED = True
     SCHEDULER_TIMEZONE = 'UTC'
     
+    # [上传引擎配置]
+    # thread：共享的工作线程池 + 延时队列（默认）；asyncio：所有网站的上传流程在同一个事件循环中运行
+    UPLOAD_ENGINE = os.environ.get('UPLOAD_ENGINE') or 'thread'
+    # 线程池引擎的工作线程数，线程只在发送请求和读写数据库时占用，文件间隔不占线程
+    MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 20))
+    # 上传流程启动节奏（令牌桶）：全局每秒启动数和突发数，每个域名每秒启动数和突发数
+    UPLOAD_START_RATE = float(os.environ.get('UPLOAD_START_RATE', 5))
+    UPLOAD_START_BURST = int(os.environ.get('UPLOAD_START_BURST', 10))
+    UPLOAD_HOST_START_RATE = float(os.environ.get('UPLOAD_HOST_START_RATE', 1))
+    UPLOAD_HOST_START_BURST = int(os.environ.get('UPLOAD_HOST_START_BURST', 1))
+    # 执行记录批量写入：攒够多少条或间隔多少毫秒写入一次
+    EXECUTION_FLUSH_SIZE = int(os.environ.get('EXECUTION_FLUSH_SIZE', 100))
+    EXECUTION_FLUSH_INTERVAL_MS = int(os.environ.get('EXECUTION_FLUSH_INTERVAL_MS', 1000))
+    # 写入失败的记录最多尝试几次，仍失败的写入死信文件（每行一条JSON）；缓冲的最大条数，满了由上传线程同步写入
+    EXECUTION_FLUSH_MAX_RETRIES = int(os.environ.get('EXECUTION_FLUSH_MAX_RETRIES', 5))
+    EXECUTION_BUFFER_MAX = int(os.environ.get('EXECUTION_BUFFER_MAX', 10000))
+    EXECUTION_DEAD_LETTER_FILE = os.environ.get('EXECUTION_DEAD_LETTER_FILE') or \
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'execution_dead_letter.jsonl')
+    # 同一目标连续上传失败多少次后停止，剩余文件由其他目标接手
+    UPLOAD_MAX_CONSECUTIVE_FAILURES = int(os.environ.get('UPLOAD_MAX_CONSECUTIVE_FAILURES', 3))
+    # asyncio引擎的全局并发连接数上限
+    ASYNC_UPLOAD_MAX_CONNECTIONS = int(os.environ.get('ASYNC_UPLOAD_MAX_CONNECTIONS', 50))
+    # asyncio引擎写数据库的线程数
+    ASYNC_UPLOAD_DB_WORKERS = int(os.environ.get('ASYNC_UPLOAD_DB_WORKERS', 4))
+    
+    # [统计缓存配置] 管理后台统计结果的缓存秒数
+    ADMIN_STATS_CACHE_TTL = int(os.environ.get('ADMIN_STATS_CACHE_TTL', 10))
+    
+    # [网站目录缓存配置] 网站配置和栏目的缓存秒数，增删网站配置时会立即清空
+    SITE_DIRECTORY_CACHE_TTL = int(os.environ.get('SITE_DIRECTORY_CACHE_TTL', 300))
+    
+    # [系统状态采样配置] 采样间隔（秒）和保留的采样条数
+    SYSTEM_MONITOR_INTERVAL = int(os.environ.get('SYSTEM_MONITOR_INTERVAL', 5))
+    SYSTEM_MONITOR_HISTORY = int(os.environ.get('SYSTEM_MONITOR_HISTORY', 120))
+    
+    # [执行记录保留配置]
+    # 明细保留天数（0 表示不清理），更早的明细每天定时分块删除，每日汇总不受影响
+    EXECUTION_RETENTION_DAYS = int(os.environ.get('EXECUTION_RETENTION_DAYS', 0))
+    # 每天几点执行清理
+    EXECUTION_RETENTION_HOUR = int(os.environ.get('EXECUTION_RETENTION_HOUR', 3))
+    # 每块删除的记录数和块之间停顿的毫秒数
+    EXECUTION_RETENTION_CHUNK_SIZE = int(os.environ.get('EXECUTION_RETENTION_CHUNK_SIZE', 1000))
+    EXECUTION_RETENTION_PAUSE_MS = int(os.environ.get('EXECUTION_RETENTION_PAUSE_MS', 200))
+    # 删除前归档到该目录（gzip压缩的CSV），为空则不归档
+    EXECUTION_ARCHIVE_DIR = os.environ.get('EXECUTION_ARCHIVE_DIR') or ''
+    
+    # [Excel批量导入配置]
+    # 探测网站的线程数、同一域名同时探测的网站数、每个请求的超时秒数、每批保存的结果数
+    URL_IMPORT_MAX_WORKERS = int(os.environ.get('URL_IMPORT_MAX_WORKERS', 20))
+    URL_IMPORT_HOST_CONCURRENCY = int(os.environ.get('URL_IMPORT_HOST_CONCURRENCY', 2))
+    URL_IMPORT_TIMEOUT = int(os.environ.get('URL_IMPORT_TIMEOUT', 15))
+    URL_IMPORT_SAVE_BATCH = int(os.environ.get('URL_IMPORT_SAVE_BATCH', 50))
+    
     # [WebSocket配置]
     SOCKETIO_ASYNC_MODE = 'threading'
     
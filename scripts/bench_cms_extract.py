@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+[页面提取性能对比脚本]
+用保存的帝国CMS后台页面（scripts/fixtures/cms）对比
+BeautifulSoup 全文解析与 cms_extract 定向提取的耗时，并校验两者结果一致
+"""
+import os
+import sys
+import timeit
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import cms_extract
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'cms')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+# [BeautifulSoup版本] 与改造前 test.py 中的写法一致
+def bs_login_hidden(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    return {tag['name']: tag.get('value', '') for tag in soup.select("input[type=hidden]")}
+
+
+def bs_main_page(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    link = soup.find('a', href=True, title="帝国网站管理系统")
+    td = soup.find('td', string='增加信息')
+    return link.get('href') if link else None, td.get('onclick') if td else None
+
+
+def bs_charset(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    if soup.find('td', string='GBK'):
+        return 'GBK'
+    if soup.find('td', string='UTF-8'):
+        return 'UTF-8'
+    return None
+
+
+def bs_zixun_page(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    script_tag = soup.find('script', src=True)
+    src = script_tag.get('src') if script_tag else None
+    for script in soup.find_all('script'):
+        if script.string and 'changeclass' in script.string:
+            return src, script.string
+    return src, None
+
+
+def bs_form_hidden(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    return {tag['name']: tag.get('value', '') for tag in soup.select("form input[type=hidden]")}
+
+
+def bs_success(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    return soup.find(string=lambda text: text and "增加信息成功" in text) is not None
+
+
+def bs_refresh_buttons(page_html):
+    soup = BeautifulSoup(page_html, 'html.parser')
+    result = []
+    for value in ('刷新首页', '刷新所有信息栏目页', '刷新所有信息内容页面'):
+        button = soup.find('input', {'value': value})
+        result.append(button.get('onclick') if button else None)
+    return result
+
+
+# [cms_extract版本]
+def fast_main_page(page_html):
+    return (cms_extract.find_link_href(page_html, "帝国网站管理系统"),
+            cms_extract.find_td_onclick(page_html, '增加信息'))
+
+
+def fast_zixun_page(page_html):
+    script_content, _ = cms_extract.find_addnews_template(page_html)
+    return cms_extract.first_script_src(page_html), script_content
+
+
+def fast_refresh_buttons(page_html):
+    return [cms_extract.find_input_onclick(page_html, value)
+            for value in ('刷新首页', '刷新所有信息栏目页', '刷新所有信息内容页面')]
+
+
+CASES = [
+    ('登录页隐藏字段', 'login.html', bs_login_hidden, cms_extract.hidden_inputs),
+    ('主页链接和增加信息', 'main.html', bs_main_page, fast_main_page),
+    ('网站编码', 'sysinfo.html', bs_charset, cms_extract.detect_charset),
+    ('栏目选择页脚本', 'zixun.html', bs_zixun_page, fast_zixun_page),
+    ('上传表单隐藏字段', 'addnews_form.html', bs_form_hidden,
+     lambda page_html: cms_extract.hidden_inputs(page_html, form_only=True)),
+    ('提交成功提示', 'post_success.html', bs_success, cms_extract.contains_success),
+    ('刷新按钮', 'refresh.html', bs_refresh_buttons, fast_refresh_buttons),
+]
+
+
+def run_benchmark(number=200):
+    """
+    [执行对比]
+    每个用例先校验结果一致，再分别计时 number 次
+    """
+    print(f'{"用例":<16}{"页面大小":>10}{"BeautifulSoup(ms)":>20}{"cms_extract(ms)":>18}{"加速比":>10}')
+    total_bs = total_fast = 0.0
+
+    for title, fixture, bs_func, fast_func in CASES:
+        page_html = load_fixture(fixture)
+
+        expected = bs_func(page_html)
+        actual = fast_func(page_html)
+        if expected != actual:
+            raise AssertionError(f'{title} 提取结果不一致:\n  BeautifulSoup: {expected!r}\n  cms_extract:   {actual!r}')
+
+        bs_time = timeit.timeit(lambda: bs_func(page_html), number=number) / number * 1000
+        fast_time = timeit.timeit(lambda: fast_func(page_html), number=number) / number * 1000
+        total_bs += bs_time
+        total_fast += fast_time
+
+        print(f'{title:<16}{len(page_html):>10}{bs_time:>20.3f}{fast_time:>18.3f}{bs_time / fast_time:>9.1f}x')
+
+    print(f'{"合计":<16}{"":>10}{total_bs:>20.3f}{total_fast:>18.3f}{total_bs / total_fast:>9.1f}x')
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+[数据库迁移脚本]
+为已有数据库补齐新增的索引并回填数据
+db.create_all() 只会创建不存在的表，不会给已有的表加索引，也不会修改已有数据
+"""
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, update
+from app import create_app, db
+from app.models.file import File
+from app.models.task_execution import TaskExecution
+
+# 旧版本创建、现已不再使用的索引 (表名, 索引名)
+OBSOLETE_INDEXES = (
+    # 统计改为读取每日汇总表后没有查询使用，每次写入执行记录都要维护这个很宽的复合索引
+    ('task_executions', 'ix_task_executions_url_stats'),
+)
+
+
+def create_missing_indexes():
+    """
+    [创建缺失的索引]
+    遍历所有模型声明的索引，已存在的自动跳过
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+            print(f'  索引已就绪: {table.name}.{index.name}')
+
+
+def drop_obsolete_indexes():
+    """
+    [删除废弃的索引]
+    不存在的自动跳过
+    """
+    inspector = inspect(db.engine)
+    for table_name, index_name in OBSOLETE_INDEXES:
+        if not inspector.has_table(table_name):
+            continue
+        if index_name not in {index['name'] for index in inspector.get_indexes(table_name)}:
+            continue
+        db.session.execute(db.text(f'DROP INDEX {index_name} ON {table_name}'))
+        db.session.commit()
+        print(f'  已删除索引: {table_name}.{index_name}')
+
+
+def backfill_file_folder(batch_size=1000):
+    """
+    [回填 files.folder]
+    根据 file_path 推导文件所属文件夹，按主键分批更新
+    """
+    last_id = 0
+    updated_count = 0
+
+    while True:
+        rows = db.session.query(File.id, File.user_id, File.file_path, File.folder)\
+                         .filter(File.id > last_id)\
+                         .order_by(File.id.asc())\
+                         .limit(batch_size).all()
+        if not rows:
+            break
+
+        changes = []
+        for row in rows:
+            folder = File.folder_from_path(row.file_path, row.user_id)
+            if folder != row.folder:
+                changes.append({'id': row.id, 'folder': folder})
+
+        if changes:
+            # 按主键批量UPDATE
+            db.session.execute(update(File), changes)
+            db.session.commit()
+            updated_count += len(changes)
+
+        last_id = rows[-1].id
+
+    print(f'  files.folder 回填完成，更新 {updated_count} 条记录')
+
+
+def backfill_execution_daily():
+    """
+    [回填 task_execution_daily]
+    升级后的应用一启动就会往汇总表写入新的执行记录，不能用“汇总表为空”判断是否需要回填；
+    重建对每个任务是幂等的（只重建明细中最早一天及之后的汇总），所以对所有有明细的任务都重建一次。
+    重建期间写入的执行记录可能被重复计数，请在应用停止时执行迁移
+    """
+    from rebuild_execution_daily import rebuild_execution_daily
+
+    task_ids = [row.task_id for row in db.session.query(TaskExecution.task_id)
+                                                 .distinct()
+                                                 .order_by(TaskExecution.task_id.asc()).all()]
+    if not task_ids:
+        print('  无需回填')
+        return
+    rebuild_execution_daily(task_ids)
+
+
+def migrate_database():
+    """
+    [执行迁移]
+    可重复执行，每一步都是幂等的
+    """
+    app, _ = create_app()
+
+    with app.app_context():
+        print('正在创建缺失的表...')
+        db.create_all()
+
+        print('正在创建缺失的索引...')
+        create_missing_indexes()
+
+        print('正在删除废弃的索引...')
+        drop_obsolete_indexes()
+
+        print('正在回填文件夹字段...')
+        backfill_file_folder()
+
+        print('正在回填执行记录每日汇总...')
+        backfill_execution_daily()
+
+        print('数据库迁移完成！')
+
+
+if __name__ == '__main__':
+    migrate_database()
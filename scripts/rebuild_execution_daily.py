@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+[执行记录每日汇总重建脚本]
+根据 task_executions 历史记录重建 task_execution_daily 汇总表
+明细已按保留天数清理过的任务，只重建明细中最早一天及之后的汇总，更早日期的汇总保持不变
+用法:
+    python scripts/rebuild_execution_daily.py            # 重建全部任务
+    python scripts/rebuild_execution_daily.py 12 15      # 只重建指定任务
+"""
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.task import Task
+from app.models.task_execution import TaskExecutionDaily
+
+
+def rebuild_execution_daily(task_ids=None):
+    """
+    [重建汇总]
+    逐个任务重建并提交，避免一次事务处理全部历史记录
+    """
+    if not task_ids:
+        task_ids = [row.id for row in db.session.query(Task.id).order_by(Task.id.asc()).all()]
+
+    total_rows = 0
+    for task_id in task_ids:
+        rows = TaskExecutionDaily.rebuild(task_id)
+        db.session.commit()
+        total_rows += rows
+        print(f'  任务 {task_id}: 写入 {rows} 条汇总')
+
+    print(f'汇总重建完成，共 {len(task_ids)} 个任务，{total_rows} 条汇总')
+
+
+if __name__ == '__main__':
+    app, _ = create_app()
+
+    with app.app_context():
+        rebuild_execution_daily([int(task_id) for task_id in sys.argv[1:]])
@@ -3,12 +3,19 @@ import re
 from urllib.parse import urljoin
 import time
 import requests
-from bs4 import BeautifulSoup
 import webbrowser
 import tempfile
 import os
 
 from werkzeug.local import T
+from cms_session_pool import SiteSessionPool, is_login_expired
+import cms_extract
+
+# 全局登录会话池，按网站复用已登录的session
+SESSION_POOL = SiteSessionPool()
+# upload 检测到登录失效时返回的信息，调用方据此重新登录后重试
+LOGIN_EXPIRED_MSG = '登录失效'
+
 def open_resp(resp):
     # 假设 resp.text 是你的 HTML 内容
     html_content = resp.text  # 替换为实际 HTML 内容
@@ -29,11 +36,9 @@ def open_resp(resp):
     webbrowser.open(f"file://{temp_file_path}")
 
 def get_js_fr_zixun_page(m_session,m_zixun_page,m_zixun_page_url):
-    # 解析HTML获取JavaScript文件URL
-    soup = BeautifulSoup(m_zixun_page.text, 'html.parser')
-    script_tag = soup.find('script', src=True)
-    if script_tag and 'cmsclass.js' in script_tag.get('src', ''):
-        js_url = script_tag.get('src')
+    # 从HTML中获取JavaScript文件URL
+    js_url = cms_extract.first_script_src(m_zixun_page.text)
+    if js_url and 'cmsclass.js' in js_url:
         print('jsurl'+js_url)
 
 
@@ -56,41 +61,41 @@ def get_js_fr_zixun_page(m_session,m_zixun_page,m_zixun_page_url):
             print(js_content[:500])  # 打印前500个字符
         return js_results
 
-def get_upload_writings_page_url(zixun_page,base_url,num ):
+def get_addnews_url_template(zixun_page):
     """
     从 zixun_page 中提取 JavaScript 中的 URL 模板
     返回类似 'AddNews.php?&ehash_i6leQ=3ORDRW6Wj5kqB7kg7nNE&enews=AddNews&classid=' 的字符串
     """
-    # 解析HTML获取JavaScript内容
-    soup = BeautifulSoup(zixun_page.text, 'html.parser')
-    
-    # 查找包含 changeclass 函数的 script 标签
-    script_tags = soup.find_all('script')
-    
-    for script in script_tags:
-        if script.string and 'changeclass' in script.string:
-            script_content = script.string
-            
-            # 使用正则表达式提取 self.location.href 中的 URL 模板
-            # 匹配模式：self.location.href='AddNews.php?&ehash_i6leQ=3ORDRW6Wj5kqB7kg7nNE&enews=AddNews&classid='+obj.addclassid.value;
-            pattern = r"self\.location\.href='([^']*AddNews\.php[^']*)'"
-            match = re.search(pattern, script_content)
-
-            if match:
-
-                url_template = match.group(1)
-                url_template_num = url_template + str(num)
-                upload_writings_url = urljoin(base_url + '/', url_template_num)
-                print(f"提取到的URL模板: {upload_writings_url}")
-                return upload_writings_url
-            else:
-                print("未找到匹配的URL模板")
-                print("JavaScript内容:")
-                print(script_content)
-                return None
-    
-    print("未找到包含 changeclass 函数的 script 标签")
-    return None
+    # 在包含 changeclass 函数的 script 标签中提取 self.location.href 的 URL 模板
+    # 匹配模式：self.location.href='AddNews.php?&ehash_i6leQ=3ORDRW6Wj5kqB7kg7nNE&enews=AddNews&classid='+obj.addclassid.value;
+    script_content, url_template = cms_extract.find_addnews_template(zixun_page.text)
+
+    if script_content is None:
+        print("未找到包含 changeclass 函数的 script 标签")
+        return None
+    if url_template is None:
+        print("未找到匹配的URL模板")
+        print("JavaScript内容:")
+        print(script_content)
+    return url_template
+
+def get_upload_writings_page_url(zixun_page,base_url,num,site=None):
+    """
+    拼接指定栏目的上传文章页面url
+    传入会话池中的 site 时，URL模板只从 zixun_page 中解析一次
+    """
+    url_template = site.addnews_template if site is not None else None
+    if url_template is None:
+        url_template = get_addnews_url_template(zixun_page)
+        if url_template is None:
+            return None
+        if site is not None:
+            site.addnews_template = url_template
+
+    url_template_num = url_template + str(num)
+    upload_writings_url = urljoin(base_url + '/', url_template_num)
+    print(f"提取到的URL模板: {upload_writings_url}")
+    return upload_writings_url
 
 def get_meta_jump_url(resp_post_session,login_url):
     # 三： meta refresh 跳转
@@ -125,8 +130,7 @@ def login_diguo(update_context):
     # open_resp(resp_get)
 
 
-    soup = BeautifulSoup(resp_get.text, "html.parser")
-    hidden_inputs = {tag['name']: tag.get('value', '') for tag in soup.select("input[type=hidden]")}
+    hidden_inputs = cms_extract.hidden_inputs(resp_get.text)
 
     # 2. 构造登录表单
     login_data = {
@@ -163,28 +167,25 @@ def login_diguo(update_context):
         time.sleep(0.1)
 
         # 为了得到‘增加信息’标签中跳转到的链接
-        # 使用BeautifulSoup解析HTML
-        soup = BeautifulSoup(resp_final.text, 'html.parser')
+        main_html = resp_final.text
         
         # 找到包含是否是gbk信息的页面
         # 查找指定的链接元素
-        target_link = soup.find('a', href=True, title="帝国网站管理系统")
-        if target_link:
-            href = target_link.get('href')
+        href = cms_extract.find_link_href(main_html, "帝国网站管理系统")
+        if href:
             # 使用base_url和href拼接得到新的网址
             new_url = urljoin(base_url + '/', href)
             # print(f"找到目标链接: {new_url}")
             
             # 进入新页面
             resp_new_page = session.get(new_url)
-            soup_new = BeautifulSoup(resp_new_page.text, 'html.parser')
             
             # 查找是否有 <td>GBK</td>
-            gbk_td = soup_new.find('td', string='GBK')
-            if gbk_td:
+            charset = cms_extract.detect_charset(resp_new_page.text)
+            if charset == 'GBK':
                 print('这个网站是gbk')
                 ifGBK = True
-            elif  soup_new.find('td', string='UTF-8'):
+            elif charset == 'UTF-8':
                 print('这个网站是utf-8')
                 ifGBK = False
             else:
@@ -194,9 +195,8 @@ def login_diguo(update_context):
 
         
         # 查找包含"增加信息"文本的TD标签
-        td = soup.find('td', string='增加信息')
-        if td and td.get('onclick'):
-            onclick = td.get('onclick')
+        onclick = cms_extract.find_td_onclick(main_html, '增加信息')
+        if onclick:
             # 从onclick中提取URL
             url_match = re.search(r"JumpToMain\('([^']+)'\)", onclick)
             if url_match:
@@ -209,34 +209,42 @@ def login_diguo(update_context):
             print("从''增加信息''提取URL失败")
     else:
         print("未找到包含'增加信息'的TD标签")                
-def upload_before(update_context):
-
-    session = update_context.session
-    base_url = update_context.base_url
+def get_site_session(update_context):
+    """
+    从会话池获取已登录的网站会话，未登录时执行一次完整的 login_diguo
+    调用后 update_context.session 即为池中已登录的session
+    """
+    return SESSION_POOL.acquire(update_context, login_diguo)
 
- 
+def upload_before(update_context):
 
-    zixun_page,zixun_page_url,ifGBK = login_diguo(update_context)
-    #获取js文件中的内容，得到例如[('1', '|-资讯'), ('2', '|-疾病'), ('3', '|-中医'), ('4', '|-两性')]
-    js_result = get_js_fr_zixun_page(session, zixun_page,zixun_page_url)
-    print(f'执行upload_before{js_result}')
-    return zixun_page,ifGBK
+    site = get_site_session(update_context)
+    print(f'执行upload_before，复用登录会话: {update_context.base_url}')
+    return site.zixun_page,site.ifGBK
    
 def upload(session,zixun_page,base_url,menu_value,title,text,ifGBK=False):
-    # 七，获取上传文章页面的url ，menu_value是指定的栏目
-    upload_url = get_upload_writings_page_url(zixun_page,base_url,menu_value)
-    upload_writing_page = session.get(upload_url)
-    # open_resp(upload_writing_page)
-
-    # print(f'上传文件名:{title}')
-    '''
-    上传文章
-    '''
-    soup = BeautifulSoup(upload_writing_page.text, "html.parser")
-
-    # 提取表单里的隐藏字段
-    hidden_inputs = {tag['name']: tag.get('value', '')
-                        for tag in soup.select("form input[type=hidden]")}
+    # 会话池中的网站按栏目缓存了表单的固定隐藏字段（filepass 等每次不同的字段会重新生成），
+    # 同一栏目第二篇文章起只需一次POST
+    site = SESSION_POOL.find_site(session)
+    hidden_inputs = site.get_upload_form(menu_value) if site is not None else None
+
+    if hidden_inputs is None:
+        # 七，获取上传文章页面的url ，menu_value是指定的栏目
+        upload_url = get_upload_writings_page_url(zixun_page,base_url,menu_value,site)
+        upload_writing_page = session.get(upload_url)
+        # open_resp(upload_writing_page)
+        if is_login_expired(upload_writing_page.text):
+            SESSION_POOL.invalidate_session(session)
+            return upload_writing_page.status_code,LOGIN_EXPIRED_MSG
+
+        # print(f'上传文件名:{title}')
+        '''
+        上传文章
+        '''
+        # 提取表单里的隐藏字段
+        hidden_inputs = cms_extract.hidden_inputs(upload_writing_page.text, form_only=True)
+        if site is not None:
+            site.set_upload_form(menu_value, hidden_inputs)
 
 
     # 3. 构造文章数据
@@ -264,56 +272,78 @@ def upload(session,zixun_page,base_url,menu_value,title,text,ifGBK=False):
     post_url = base_url + "/ecmsinfo.php"
     r = session.post(post_url, data=post_data)
     open_resp(r)
-    soup = BeautifulSoup(r.text, 'html.parser')
-
+    if is_login_expired(r.text):
+        SESSION_POOL.invalidate_session(session)
+        return r.status_code,LOGIN_EXPIRED_MSG
     # 方法1：直接搜索文本
-    if soup.find(string=lambda text: text and "增加信息成功" in text):
+    if cms_extract.contains_success(r.text):
         print("✅ 增加信息成功！")
         msg = '增加信息成功'
     else:
         print("❌ 没有增加信息成功！")
         msg = '可能异常'
+        # 提交失败：表单字段可能已过期，丢弃缓存，下次重新获取
+        if site is not None:
+            site.drop_upload_form(menu_value)
     # 返回状态码
     return r.status_code,msg
 
       
 
 
-def get_menu(update_context):
-    session = update_context.session
+def get_menu(update_context, use_pool=True):
+    if not use_pool:
+        return check_menu(update_context)
+
+    site = get_site_session(update_context)
 
-    zixun_page, zixun_page_url, ifGBK = login_diguo(update_context)  
     # 获取js文件中的内容，得到例如[('1', '|-资讯'), ('2', '|-疾病'), ('3', '|-中医'), ('4', '|-两性')]
-    js_result = get_js_fr_zixun_page(session, zixun_page, zixun_page_url)
+    js_result = get_js_fr_zixun_page(site.session, site.zixun_page, site.zixun_page_url)
     # print(f"执行get_menu得到：{js_result}")
     return js_result
 
 
-def refresh_all(update_context):
-    session = update_context.session
-    zixun_page, zixun_page_url, ifGBK = login_diguo(update_context)
-    # print(zixun_page_url)
-
-    url = zixun_page_url
-    match = re.search(r'(\?ehash_[^=]+=[^&]+)', url)
-    ehash = match.group(0)  #得到?ehash_xxxxxxxxx
+def check_menu(update_context):
+    """
+    用一次性的session登录并获取菜单，不经过会话池
+    用于检测用户填写的账号密码：登录结果不会被缓存，也不会复用池中已登录的会话
+    """
+    session = requests.Session()
+    update_context.session = session
+    try:
+        result = login_diguo(update_context)
+        if not result:
+            raise Exception(f"登录失败: {update_context.base_url}")
+        zixun_page, zixun_page_url, _ = result
+        return get_js_fr_zixun_page(session, zixun_page, zixun_page_url)
+    finally:
+        session.close()
 
 
-    # 拼接成刷新页面url
-    base = urljoin(update_context.base_url + "/", "ReHtml/ChangeData.php")
-    refresh_url = base + ehash
-    # print(refresh_url)
-    resp_get = session.get(refresh_url)
-    # open_resp(resp_get)
+def refresh_all(update_context):
+    # 复用池中的登录会话和ehash，登录失效时重新登录一次
+    for _ in range(2):
+        site = get_site_session(update_context)
+        session = site.session
+        ehash = site.ehash  #得到?ehash_xxxxxxxxx
+
+        # 拼接成刷新页面url
+        base = urljoin(update_context.base_url + "/", "ReHtml/ChangeData.php")
+        refresh_url = base + ehash
+        # print(refresh_url)
+        resp_get = session.get(refresh_url)
+        # open_resp(resp_get)
+        if not is_login_expired(resp_get.text):
+            break
+        SESSION_POOL.invalidate(update_context)
     
-    # 解析HTML，找到"刷新首页"按钮并提取onclick中的URL
-    soup = BeautifulSoup(resp_get.text, 'html.parser')
+    # 找到"刷新首页"按钮并提取onclick中的URL
+    refresh_html = resp_get.text
     
     # 刷新一：刷新首页
-    refresh_button = soup.find('input', {'value': '刷新首页'})
+    onclick_content = cms_extract.find_input_onclick(refresh_html, '刷新首页')
     
-    if refresh_button and refresh_button.get('onclick'):
-        onclick_content = refresh_button.get('onclick')
+    if onclick_content:
         
         # 从onclick中提取URL
         # onclick格式: self.location.href='../ecmschtml.php?enews=ReIndex&ehash_Rx5Oo=...'
@@ -338,10 +368,9 @@ def refresh_all(update_context):
         print("未找到刷新首页按钮")
     
     # 刷新二：刷新所有信息栏目页，有三次跳转
-    refresh_all_button = soup.find('input', {'value': '刷新所有信息栏目页'})
+    onclick_content = cms_extract.find_input_onclick(refresh_html, '刷新所有信息栏目页')
     
-    if refresh_all_button and refresh_all_button.get('onclick'):
-        onclick_content = refresh_all_button.get('onclick')
+    if onclick_content:
         
         # 从onclick中提取URL
         # onclick格式: window.open('../ecmschtml.php?enews=ReListHtml_all&...','','');
@@ -396,10 +425,9 @@ def refresh_all(update_context):
         print("未找到刷新所有信息栏目页按钮")
     
     # 刷新三：勾选"全部刷新"并点击"刷新所有信息内容页面"
-    refresh_content_button = soup.find('input', {'value': '刷新所有信息内容页面'})
+    onclick_content = cms_extract.find_input_onclick(refresh_html, '刷新所有信息内容页面')
     
-    if refresh_content_button and refresh_content_button.get('onclick'):
-        onclick_content = refresh_content_button.get('onclick')
+    if onclick_content:
         
         # onclick内容示例：
         # var toredohtml=0;if(document.dorehtml.havehtml.checked==true){toredohtml=1;}
@@ -544,9 +572,9 @@ if __name__ == '__main__':
     
    
 
-    zixun_page = upload_before(upload_date)
+    zixun_page,ifGBK = upload_before(upload_date)
     for title,text in titles_and_texts.items():
-        upload(session,zixun_page,upload_date.base_url,menu_value,title,text)
+        upload(upload_date.session,zixun_page,upload_date.base_url,menu_value,title,text,ifGBK)
         time.sleep(3)
 
 
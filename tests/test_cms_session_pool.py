@@ -0,0 +1,74 @@
+"""
+登录会话池上传表单缓存测试
+"""
+import unittest
+from unittest import mock
+
+import cms_extract
+from cms_session_pool import SiteSession
+
+# 帝国CMS AddNews.php 增加信息表单的隐藏字段（摘自实际页面，省略了可见字段）
+ADDNEWS_FORM = '''
+<form name="add" method="post" action="ecmsinfo.php" enctype="multipart/form-data">
+  <input type=hidden value="AddNews" name=enews>
+  <input type=hidden value="{classid}" name=classid>
+  <input type=hidden value="0" name=bclassid>
+  <input type=hidden value="0" name=id>
+  <input type=hidden value="{filepass}" name=filepass>
+  <input type=hidden value="admin" name=username>
+  <input type=hidden value="" name=oldfilename>
+  <input type=hidden value="0" name=oldgroupid>
+  <input type=hidden value="0" name=oldchecked>
+  <input type=hidden value="1" name=ecmsnfrom>
+  <input type=hidden value="1" name=fstb>
+  <input type=hidden value="0" name=oldttid>
+  <input type=hidden value="" name=oldztids>
+  <input type=hidden value="{ehash}" name=ehash_i6leQ>
+  <input type="text" name="title" value="">
+</form>
+'''
+
+
+def real_form(filepass, classid='4', ehash='3ORDRW6Wj5kqB7kg7nNE'):
+    page = ADDNEWS_FORM.format(classid=classid, filepass=filepass, ehash=ehash)
+    return cms_extract.hidden_inputs(page, form_only=True)
+
+
+class UploadFormCacheTest(unittest.TestCase):
+
+    def test_real_form_fields(self):
+        fields = real_form('1758779853')
+        self.assertEqual(fields['filepass'], '1758779853')
+        self.assertEqual(fields['enews'], 'AddNews')
+        self.assertNotIn('title', fields)
+
+    def test_filepass_is_not_cached(self):
+        site = SiteSession(('http://a.example.com/e/admin', 'admin', 'digest'))
+        site.set_upload_form('4', real_form('1758779853'))
+
+        with mock.patch('cms_session_pool.time.time', return_value=1758779900.5):
+            cached = site.get_upload_form('4')
+        self.assertEqual(cached['filepass'], '1758779900')
+        self.assertEqual(cached['ehash_i6leQ'], '3ORDRW6Wj5kqB7kg7nNE')
+        self.assertEqual(cached['classid'], '4')
+
+    def test_changing_field_stops_caching(self):
+        site = SiteSession(('http://a.example.com/e/admin', 'admin', 'digest'))
+        site.set_upload_form('4', real_form('1758779853'))
+        site.set_upload_form('5', real_form('1758779854', classid='5'))
+
+        # 再次获取实际表单时发现 ehash 字段每次不同：两个栏目都不再使用缓存
+        site.set_upload_form('4', real_form('1758779999', ehash='X0Y1Z2'))
+        self.assertIn('ehash_i6leQ', site.volatile_fields)
+        self.assertIsNone(site.get_upload_form('4'))
+        self.assertIsNone(site.get_upload_form('5'))
+
+    def test_drop_upload_form(self):
+        site = SiteSession(('http://a.example.com/e/admin', 'admin', 'digest'))
+        site.set_upload_form('4', real_form('1758779853'))
+        site.drop_upload_form('4')
+        self.assertIsNone(site.get_upload_form('4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
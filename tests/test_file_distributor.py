@@ -0,0 +1,87 @@
+"""
+文件分配器测试
+"""
+import unittest
+
+from app.file_distributor import FileDistributor
+
+SITE_A = 'http://a.example.com/'
+SITE_B = 'http://b.example.com/'
+
+
+class FileDistributorTest(unittest.TestCase):
+
+    def drain(self, distributor, index):
+        file_ids = []
+        while True:
+            file_id = distributor.next_file(index)
+            if file_id is None:
+                return file_ids
+            file_ids.append(file_id)
+
+    def test_round_robin(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_B + '栏目值:1'], [1, 2, 3, 4, 5])
+        self.assertEqual(list(distributor.queues[0]), [1, 3, 5])
+        self.assertEqual(list(distributor.queues[1]), [2, 4])
+
+    def test_same_site_columns_do_not_steal(self):
+        # 同一网站的两个栏目：第一个栏目传完时第二个栏目还在排队，不能拿走它的文件
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_A + '栏目值:2'], [1, 2, 3, 4])
+        distributor.start(0)
+        self.assertEqual(self.drain(distributor, 0), [1, 3])
+        self.assertEqual(distributor.finish(0), [])
+
+        distributor.start(1)
+        self.assertEqual(self.drain(distributor, 1), [2, 4])
+        self.assertEqual(distributor.finish(1), [])
+
+    def test_same_site_started_column_is_not_stolen(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_A + '栏目值:2'], [1, 2, 3, 4])
+        distributor.start(0)
+        distributor.start(1)
+        self.assertEqual(self.drain(distributor, 0), [1, 3])
+        self.assertEqual(distributor.remaining(1), 2)
+
+    def test_steal_from_started_target_on_other_site(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_B + '栏目值:1'], [1, 2, 3, 4, 5, 6])
+        distributor.start(0)
+        distributor.start(1)
+        self.assertEqual(distributor.next_file(1), 2)
+        self.assertEqual(self.drain(distributor, 0), [1, 3, 5, 6, 4])
+        self.assertIsNone(distributor.next_file(1))
+
+    def test_not_started_target_on_other_site_is_not_stolen(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_B + '栏目值:1'], [1, 2, 3, 4])
+        distributor.start(0)
+        self.assertEqual(self.drain(distributor, 0), [1, 3])
+        self.assertEqual(distributor.remaining(1), 2)
+
+    def test_steal_from_finished_target(self):
+        # 连续失败停止的目标剩下的文件，由其他目标继续上传
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_A + '栏目值:2'], [1, 2, 3, 4],
+                                      max_consecutive_failures=1)
+        distributor.start(0)
+        self.assertEqual(distributor.next_file(0), 1)
+        self.assertFalse(distributor.report(0, False))
+        self.assertEqual(distributor.finish(0), [])
+
+        distributor.start(1)
+        self.assertEqual(self.drain(distributor, 1), [2, 4, 3])
+
+    def test_last_finish_returns_leftover(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_B + '栏目值:1'], [1, 2, 3])
+        self.assertEqual(distributor.finish(0), [])
+        self.assertEqual(sorted(distributor.finish(1)), [1, 2, 3])
+
+    def test_drain_stops_all_targets(self):
+        distributor = FileDistributor([SITE_A + '栏目值:1', SITE_B + '栏目值:1'], [1, 2, 3])
+        distributor.start(0)
+        self.assertEqual(distributor.next_file(0), 1)
+        self.assertEqual(sorted(distributor.drain()), [2, 3])
+        self.assertIsNone(distributor.next_file(1))
+        self.assertEqual(distributor.finish(0), [])
+        self.assertEqual(distributor.finish(1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Excel导入数据解析测试
+"""
+import unittest
+
+import pandas as pd
+
+from app.url_import import IMPORT_COLUMNS, parse_import_rows
+
+
+def sheet(*rows):
+    return pd.DataFrame(list(rows), columns=IMPORT_COLUMNS, dtype=object)
+
+
+class ParseImportRowsTest(unittest.TestCase):
+
+    def test_valid_rows_are_stripped(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            (' 网站A ', ' http://a.com/ ', ' e/admin ', ' admin ', ' pass '),
+        ))
+        self.assertEqual(rows, [{'name': '网站A', 'root_url': 'http://a.com/', 'suffix': 'e/admin',
+                                 'username': 'admin', 'password': 'pass'}])
+        self.assertEqual(invalid_rows, [])
+
+    def test_default_name_and_blank_rows(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            (None, None, None, None, None),
+            (None, 'http://a.com/', 'e/admin', 'admin', 'pass'),
+        ))
+        self.assertEqual([row['name'] for row in rows], ['未命名_2'])
+        self.assertEqual(invalid_rows, [])
+
+    def test_missing_field(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            ('a', 'http://a.com/', 'e/admin', None, 'pass'),
+        ))
+        self.assertEqual(rows, [])
+        self.assertEqual([row['error_message'] for row in invalid_rows], ['缺少必要字段'])
+
+    def test_duplicate_in_file(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            ('a', 'http://a.com/', 'e/admin', 'admin', 'pass'),
+            ('b', 'http://a.com/', 'e/admin', 'admin2', 'pass2'),
+        ))
+        self.assertEqual([row['name'] for row in rows], ['a'])
+        self.assertEqual([(row['name'], row['error_message']) for row in invalid_rows], [('b', '文件中重复')])
+
+    def test_missing_row_does_not_shadow_later_complete_row(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            ('a', 'http://a.com/', 'e/admin', None, 'pass'),
+            ('b', 'http://a.com/', 'e/admin', 'admin', 'pass'),
+        ))
+        self.assertEqual([row['name'] for row in rows], ['b'])
+        self.assertEqual([(row['name'], row['error_message']) for row in invalid_rows], [('a', '缺少必要字段')])
+
+    def test_all_rows_missing(self):
+        rows, invalid_rows = parse_import_rows(sheet(
+            ('a', 'http://a.com/', None, 'admin', 'pass'),
+            ('b', 'http://a.com/', None, 'admin', 'pass'),
+        ))
+        self.assertEqual(rows, [])
+        self.assertEqual([row['error_message'] for row in invalid_rows], ['缺少必要字段', '缺少必要字段'])
+
+
+if __name__ == '__main__':
+    unittest.main()
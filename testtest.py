@@ -34,10 +34,10 @@ if __name__ == '__main__':
     session = requests.Session()
     upload_date = url_update_context(session, root_url, suffix, username, password)
 
-    zixun_page = test.upload_before(upload_date)
+    zixun_page, ifGBK = test.upload_before(upload_date)
 
     for title, text in titles_and_texts.items():
-        test.upload(session, zixun_page, upload_date.base_url, menu_value, title, text,True)
+        test.upload(upload_date.session, zixun_page, upload_date.base_url, menu_value, title, text,True)
         # time.sleep(3)
     # test.get_menu(upload_date)
 